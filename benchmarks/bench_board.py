@@ -0,0 +1,93 @@
+"""
+Benchmark the Board backends on move generation, continent checks and mission evaluation, on updates of the
+board state, and on complete games between RandomPlayers.
+
+Usage:
+    python benchmarks/bench_board.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from arrayboard import ArrayBoard  # noqa: E402
+from bitboard import BitBoard  # noqa: E402
+from board import Board, Territory  # noqa: E402
+from game import Game  # noqa: E402
+from missions import missions  # noqa: E402
+from player import RandomPlayer  # noqa: E402
+
+N_PLAYERS = 4
+N_BOARDS = 50
+N_CHANGES = 40
+N_GAMES = 5
+REPEAT = 5
+
+
+def random_states(n_boards, n_players):
+    """ Create random mid-game board states. """
+    return [[Territory(tid, random.randrange(n_players), random.choice((1, 1, 2, 3, 5, 8))) for tid in range(42)]
+            for _ in range(n_boards)]
+
+
+def random_changes(n_boards, n_players, n_changes):
+    """ Create random sequences of territory changes. """
+    return [[(random.randrange(42), random.randrange(n_players), random.choice((1, 1, 2, 3, 5, 8)))
+             for _ in range(n_changes)] for _ in range(n_boards)]
+
+
+def queries(board, all_missions):
+    """ The queries a single player runs on a board during a turn. """
+    for pid in range(N_PLAYERS):
+        for m in all_missions:
+            m.assign_to(pid)
+        board.possible_attacks(pid)
+        board.possible_fortifications(pid)
+        board.n_continents(pid)
+        for cid in range(6):
+            board.owns_continent(pid, cid)
+        for m in all_missions:
+            m.evaluate(board)
+
+
+def updates(board, changes):
+    """ Apply a sequence of changes and revert them again, as a lookahead does. """
+    board.revert(board.apply(changes))
+
+
+def games(board_cls, n_games):
+    """ Play seeded games between RandomPlayers on a backend. """
+    random.seed(0)
+    for _ in range(n_games):
+        g = Game.create([RandomPlayer() for _ in range(N_PLAYERS)], board_cls=board_cls)
+        g.initialize_armies()
+        while not g.has_ended():
+            g.play_turn()
+
+
+def main():
+    random.seed(42)
+    states = random_states(N_BOARDS, N_PLAYERS)
+    changes = random_changes(N_BOARDS, N_PLAYERS, N_CHANGES)
+    all_missions = missions(N_PLAYERS)
+    print('{:<12} {:>12} {:>10} {:>12} {:>10} {:>12} {:>10}'.format(
+        'backend', 'ms/board', 'speedup', 'us/update', 'speedup', 'ms/game', 'speedup'))
+    baseline = None
+    for board_cls in (Board, ArrayBoard, BitBoard):
+        boards = [board_cls(list(state)) for state in states]
+        seconds = min(timeit.repeat(lambda: [queries(b, all_missions) for b in boards], number=1, repeat=REPEAT))
+        query_ms = 1000. * seconds / N_BOARDS
+        seconds = min(timeit.repeat(lambda: [updates(b, c) for b, c in zip(boards, changes)], number=1,
+                                    repeat=REPEAT))
+        update_us = 1e6 * seconds / (2 * N_BOARDS * N_CHANGES)
+        game_ms = 1000. * min(timeit.repeat(lambda: games(board_cls, N_GAMES), number=1, repeat=REPEAT)) / N_GAMES
+        baseline = baseline or (query_ms, update_us, game_ms)
+        print('{:<12} {:>12.3f} {:>9.2f}x {:>12.2f} {:>9.2f}x {:>12.1f} {:>9.2f}x'.format(
+            board_cls.__name__, query_ms, baseline[0] / query_ms, update_us, baseline[1] / update_us,
+            game_ms, baseline[2] / game_ms))
+
+
+if __name__ == '__main__':
+    main()
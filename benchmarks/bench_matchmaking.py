@@ -0,0 +1,67 @@
+"""
+Benchmark the matchmaking schedules of the RiskRanker: the ranking accuracy per game played of
+random pools (uniform) against uncertainty-driven pools (adaptive). Games are decided by latent
+player strengths instead of playing Risk, such that long runs are cheap. Accuracy is the rank
+correlation with a long reference run of the uniform schedule, and with the latent strengths.
+
+Usage:
+    python benchmarks/bench_matchmaking.py
+"""
+import bisect
+import math
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from player import RandomPlayer  # noqa: E402
+from ranker import RiskRanker, rank_correlation  # noqa: E402
+
+N_PLAYERS = 200
+BUDGETS = (2, 4, 8, 16)
+REFERENCE_ITERATIONS = 200
+REPEAT = 3
+
+
+class SimulatedRanker(RiskRanker):
+    """ A RiskRanker in which the winner of a game is drawn with probability proportional to exp(strength). """
+
+    def __init__(self, players, strengths, **kwargs):
+        super(SimulatedRanker, self).__init__(players, **kwargs)
+        self.strengths = strengths
+
+    def play_game(self, player_ids, seed=None):
+        cumulative = np.cumsum([math.exp(self.strengths[pid]) for pid in player_ids])
+        self.record(player_ids, bisect.bisect_right(cumulative, random.random() * cumulative[-1]))
+
+
+def main():
+    random.seed(42)
+    players = [RandomPlayer() for _ in range(N_PLAYERS)]
+    strengths = {id(p): random.gauss(0., 1.) for p in players}
+    truth = sorted(strengths, key=strengths.get, reverse=True)
+    reference_ranker = SimulatedRanker(players, strengths)
+    reference_ranker.run(REFERENCE_ITERATIONS)
+    reference = [pid for pid, _ in reference_ranker.rank()]
+    print('reference: {n} games, correlation with strengths {corr:.3f}'.format(
+        n=reference_ranker.n_games, corr=rank_correlation(reference, truth)))
+    print('{:<10} {:>10} {:>8} {:>12} {:>12}'.format('schedule', 'iterations', 'games', 'vs reference', 'vs strength'))
+    for n in BUDGETS:
+        for schedule in ('uniform', 'adaptive'):
+            games, vs_reference, vs_truth = [], [], []
+            for _ in range(REPEAT):
+                ranker = SimulatedRanker(players, strengths, schedule=schedule)
+                ranker.run(n)
+                ranking = [pid for pid, _ in ranker.rank()]
+                games.append(ranker.n_games)
+                vs_reference.append(rank_correlation(ranking, reference))
+                vs_truth.append(rank_correlation(ranking, truth))
+            print('{:<10} {:>10} {:>8.0f} {:>12.3f} {:>12.3f}'.format(
+                schedule, n, np.mean(games), np.mean(vs_reference), np.mean(vs_truth)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark the move scoring of the GeneticPlayer: scoring each move with a Python sum
+over feature method calls (before) against scoring all moves with one matrix-vector
+product over the feature table (after).
+
+Usage:
+    python benchmarks/bench_scoring.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from game import Game  # noqa: E402
+from geneticplayer import GeneticPlayer  # noqa: E402
+
+N_GAMES = 50
+REPEAT = 5
+
+
+def positions(n_games):
+    """ Play games up to a random turn, and return the player to move in each. """
+    result = []
+    for _ in range(n_games):
+        g = Game.create([GeneticPlayer.create() for _ in range(4)])
+        g.initialize_armies()
+        for _ in range(random.randint(4, 40)):
+            g.play_turn()
+            if g.has_ended():
+                break
+        if not g.has_ended():
+            result.append(g.current_player)
+    return result
+
+
+def attack_weight(p, a):
+    return sum((
+        p.direct_bonus(a.to_territory_id) * p['att_bonus_wgt'],
+        p.chance_ratio(a) * p['att_chance_wgt'],
+        p.conquering_chance(a) * p['att_conqc_wgt'],
+        p.mission_value(a.to_territory_id) * p['att_mission_wgt'],
+        (a.from_armies - 1) * p['att_narmies_wgt'],
+    ))
+
+
+def fortification_weight(p, f):
+    return sum((
+        p.army_vantage_difference(f) * p['ft_avantage_wgt'],
+        p.territory_vantage_difference(f) * p['ft_tvantage_wgt'],
+        (p.mission_value(f.from_territory_id) - p.mission_value(f.to_territory_id)) * p['ft_mission_wgt'],
+        (p.direct_bonus(f.from_territory_id) - p.direct_bonus(f.to_territory_id)) * p['ft_bonus_wgt'],
+        (f.from_armies - 1) * p['ft_narmies_wgt']
+    ))
+
+
+def reinforce_weight(p, tid):
+    return sum((
+        p.direct_bonus(tid) * p['re_dbonus_wgt'],
+        p.continent_value(tid) * p['re_ibonus_wgt'],
+        p.mission_value(tid) * p['re_mission_wgt'],
+        p.army_vantage(tid) * p['re_avantage_wgt'],
+        p.territory_vantage(tid) * p['re_tvantage_wgt']
+    ))
+
+
+def decide_before(p):
+    """ Score every move on its own, and recompute the weight of the best move. """
+    decisions = []
+    if p.attacks:
+        best = max(p.attacks, key=lambda a: attack_weight(p, a))
+        decisions.append((best, attack_weight(p, best)))
+    if p.fortifications:
+        best = max(p.fortifications, key=lambda f: fortification_weight(p, f))
+        decisions.append((best, fortification_weight(p, best)))
+    decisions.append(max(p.territories, key=lambda tid: reinforce_weight(p, tid)))
+    return decisions
+
+
+def decide_after(p):
+    """ Score all moves with one matrix-vector product per decision. """
+    decisions = []
+    if p.attacks:
+        weights = p.attack_weights(p.attacks)
+        decisions.append((p.attacks[weights.argmax()], weights.max()))
+    if p.fortifications:
+        weights = p.fortification_weights(p.fortifications)
+        decisions.append((p.fortifications[weights.argmax()], weights.max()))
+    decisions.append(p.reinforce())
+    return decisions
+
+
+def main():
+    random.seed(42)
+    players = positions(N_GAMES)
+    n_decisions = sum(len(decide_after(p)) for p in players)
+    agree = sum(b[0] == a[0] if isinstance(b, tuple) else b == a
+                for p in players for b, a in zip(decide_before(p), decide_after(p)))
+    print('{n} decisions in {m} positions, {agree} identical'.format(n=n_decisions, m=len(players), agree=agree))
+    print('{:<8} {:>14} {:>10}'.format('scoring', 'decisions/s', 'speedup'))
+    baseline = None
+    for name, decide in (('before', decide_before), ('after', decide_after)):
+        seconds = min(timeit.repeat(lambda: [decide(p) for p in players], number=1, repeat=REPEAT))
+        rate = n_decisions / seconds
+        baseline = baseline or rate
+        print('{:<8} {:>14.0f} {:>9.2f}x'.format(name, rate, rate / baseline))
+
+
+if __name__ == '__main__':
+    main()
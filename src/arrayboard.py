@@ -0,0 +1,223 @@
+from collections import deque
+
+import numpy as np
+
+import definitions
+from board import CHANGE_LOG_SIZE, Board, Move, Territory, zobrist_key
+from randomsource import RandomSource
+
+continent_matrix = np.array([
+    [tid in definitions.continent_territories[cid] for tid in range(42)] for cid in range(6)
+], dtype=int)
+continent_ids = [np.array(definitions.continent_territories[cid]) for cid in range(6)]
+continent_sizes = continent_matrix.sum(axis=1)
+continent_bonuses = np.array([definitions.continent_bonuses[cid] for cid in range(6)])
+neighbor_matrix = np.array([
+    [nid in definitions.territory_neighbor_ids[tid] for nid in range(42)] for tid in range(42)
+], dtype=bool)
+edge_from, edge_to = np.array([(tid, nid) for tid in range(42) for nid in definitions.territory_neighbor_ids[tid]]).T
+
+
+class ArrayBoard(Board):
+    """
+    The ArrayBoard is a Board backend which stores the state of the board
+    in two parallel integer arrays instead of a list of Territories. The
+    arrays are its only state: it keeps none of the counters or the edge
+    index of the Board, so a change of a territory writes two array
+    elements. Per-player and per-continent aggregates, frontiers and moves
+    are computed as vectorized reductions over the arrays and the static
+    continent membership and neighbor matrices.
+
+    The public Board API is unchanged: `data` still provides the state as a
+    sorted list of Territories, so it can be used as a drop-in replacement.
+
+    Args:
+        data (list): a sorted list of tuples describing the state of the
+            board, see Board.
+        rng (RandomSource): Source of the dices of the board. Defaults to a new RandomSource.
+    """
+
+    def __init__(self, data, rng=None):
+        self.rng = rng or RandomSource()
+        self.owner_array = np.array([pid for (_, pid, _) in data], dtype=int)
+        self.army_array = np.array([armies for (_, _, armies) in data], dtype=int)
+        self.journal = []
+        self.open_snapshots = 0
+        self.state_hash = reduce(lambda h, t: h ^ zobrist_key(t), data, 0)
+        self.version = 0
+        self.changes = deque(maxlen=CHANGE_LOG_SIZE)
+
+    @property
+    def data(self):
+        """
+        The state of the board as a sorted list of Territories.
+
+        Returns:
+            list: List of Territories.
+        """
+        return [Territory(tid, pid, armies) for tid, (pid, armies) in
+                enumerate(zip(self.owner_array.tolist(), self.army_array.tolist()))]
+
+    def territory(self, territory_id):
+        """
+        Get the state of a single territory.
+
+        Args:
+            territory_id (int): ID of the territory.
+
+        Returns:
+            Territory: The territory.
+        """
+        return Territory(territory_id, int(self.owner_array[territory_id]), int(self.army_array[territory_id]))
+
+    def territories(self, territory_ids):
+        """
+        Create a generator of the states of the given territories.
+
+        Args:
+            territory_ids (iterable): IDs of the territories.
+
+        Returns:
+            generator: Generator of Territories.
+        """
+        return (self.territory(tid) for tid in territory_ids)
+
+    def owned_by(self, player_id):
+        """
+        Create a boolean mask of the territories owned by a player.
+
+        Args:
+            player_id (int): ID of the player.
+
+        Returns:
+            np.ndarray: Boolean array of length 42.
+        """
+        return self.owner_array == player_id
+
+    def _continent_counts(self, player_id):
+        """
+        Count the number of territories a player owns on each continent.
+
+        Args:
+            player_id (int): ID of the player.
+
+        Returns:
+            np.ndarray: Integer array with the number of owned territories per continent ID.
+        """
+        return continent_matrix.dot(self.owned_by(player_id))
+
+    # ====================== #
+    # == Neighbor Methods == #
+    # ====================== #
+
+    def neighbors(self, territory_id):
+        return self.territories(definitions.territory_neighbor_ids[territory_id])
+
+    def n_hostile_neighbors(self, territory_id):
+        neighbor_ids = definitions.territory_neighbor_ids[territory_id]
+        return int(np.count_nonzero(self.owner_array.take(neighbor_ids) != self.owner_array[territory_id]))
+
+    # ======================= #
+    # == Continent Methods == #
+    # ======================= #
+
+    def continent(self, continent_id):
+        return self.territories(definitions.continent_territories[continent_id])
+
+    def n_continents(self, player_id):
+        return int(np.count_nonzero(self._continent_counts(player_id) == continent_sizes))
+
+    def owns_continent(self, player_id, continent_id):
+        return bool(np.all(self.owner_array.take(continent_ids[continent_id]) == player_id))
+
+    def continent_owner(self, continent_id):
+        pids = self.owner_array.take(continent_ids[continent_id])
+        if np.all(pids == pids[0]):
+            return int(pids[0])
+        return None
+
+    def continent_fraction(self, continent_id, player_id):
+        n_owned = np.count_nonzero(self.owner_array.take(continent_ids[continent_id]) == player_id)
+        return float(n_owned) / continent_sizes[continent_id]
+
+    def num_foreign_continent_territories(self, continent_id, player_id):
+        return int(np.count_nonzero(self.owner_array.take(continent_ids[continent_id]) != player_id))
+
+    # ==================== #
+    # == Action Methods == #
+    # ==================== #
+
+    def reinforcements(self, player_id):
+        counts = self._continent_counts(player_id)
+        base_reinforcements = max(3, int(counts.sum() / 3))
+        return base_reinforcements + int(continent_bonuses[counts == continent_sizes].sum())
+
+    def possible_attacks(self, player_id):
+        owned = self.owned_by(player_id)
+        return self._moves(owned, ~owned)
+
+    def possible_fortifications(self, player_id):
+        owned = self.owned_by(player_id)
+        return self._moves(owned, owned)
+
+    def frontier(self, player_id):
+        owned = self.owned_by(player_id)
+        return np.flatnonzero(owned & neighbor_matrix.dot(~owned)).tolist()
+
+    def _moves(self, owned, targets):
+        """
+        Assemble the Moves from the mobile territories in a mask to their neighbors in another mask, ordered by
+        territory IDs.
+
+        Args:
+            owned (np.ndarray): Boolean array of the territories of the player.
+            targets (np.ndarray): Boolean array of the territories that can be moved to.
+
+        Returns:
+            list: List of Moves.
+        """
+        edges = np.flatnonzero((owned & (self.army_array > 1))[edge_from] & targets[edge_to])
+        owners, armies = self.owner_array.tolist(), self.army_array.tolist()
+        return [Move(from_tid, armies[from_tid], to_tid, owners[to_tid], armies[to_tid])
+                for from_tid, to_tid in zip(edge_from[edges].tolist(), edge_to[edges].tolist())]
+
+    def check_consistency(self):
+        """
+        The arrays are the only state of the ArrayBoard, so there is nothing to check.
+        """
+        pass
+
+    # ======================= #
+    # == Territory Methods == #
+    # ======================= #
+
+    def owner(self, territory_id):
+        return int(self.owner_array[territory_id])
+
+    def armies(self, territory_id):
+        return int(self.army_array[territory_id])
+
+    def n_armies(self, player_id):
+        return int(self.army_array[self.owned_by(player_id)].sum())
+
+    def n_mobile(self, player_id):
+        return int(np.count_nonzero(self.owned_by(player_id) & (self.army_array > 1)))
+
+    def n_territories(self, player_id):
+        return int(np.count_nonzero(self.owned_by(player_id)))
+
+    def territories_of(self, player_id):
+        return np.flatnonzero(self.owned_by(player_id)).tolist()
+
+    def mobile(self, player_id):
+        return self.territories(np.flatnonzero(self.owned_by(player_id) & (self.army_array > 1)).tolist())
+
+    def _update(self, territory_id, player_id, armies):
+        previous = (territory_id, self.owner_array.item(territory_id), self.army_array.item(territory_id))
+        if self.open_snapshots:
+            self.journal.append(previous)
+        self.state_hash ^= zobrist_key(previous) ^ zobrist_key((territory_id, player_id, armies))
+        self.owner_array[territory_id] = player_id
+        self.army_array[territory_id] = armies
+        self.version += 1
+        self.changes.append((self.version, territory_id, previous[1] != player_id))
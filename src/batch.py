@@ -0,0 +1,553 @@
+import numpy as np
+
+import battle
+import definitions
+from arrayboard import continent_bonuses, continent_matrix, continent_sizes, edge_from, edge_to
+from cards import Cards
+from geneticplayer import GeneticPlayer
+from missions import missions as get_missions, ContinentMission, ExtraContinentMission, PlayerMission, \
+    TerritoryMission
+from player import RandomPlayer
+
+MISSION_BASE, MISSION_TERRITORY, MISSION_PLAYER, MISSION_CONTINENT = range(4)
+
+edge_matrix = np.zeros((len(edge_from), 42))
+edge_matrix[np.arange(len(edge_from)), edge_from] = 1.
+degrees = edge_matrix.sum(axis=0)
+
+territory_continents = np.array([definitions.territory_continents[tid] for tid in range(42)])
+territory_bonuses = continent_bonuses[territory_continents].astype(float)
+
+card_set_names = ('infantry', 'cavalry', 'artillery', 'mix')
+card_set_cards = np.array([Cards.card_sets[name][0] for name in card_set_names])
+card_set_armies = np.array([Cards.card_sets[name][1] for name in card_set_names])
+
+weight_names = (
+    'turn_in_cutoff',
+    'att_bonus_wgt', 'att_chance_wgt', 'att_conqc_wgt', 'att_mission_wgt', 'att_narmies_wgt',
+    'att_cutoff', 'att_cutoff_win',
+    're_dbonus_wgt', 're_ibonus_wgt', 're_mission_wgt', 're_avantage_wgt', 're_tvantage_wgt',
+    'ft_min_wgt', 'ft_avantage_wgt', 'ft_tvantage_wgt', 'ft_mission_wgt', 'ft_bonus_wgt', 'ft_narmies_wgt'
+)
+W = {name: i for i, name in enumerate(weight_names)}
+
+
+def weight_vector(player):
+    """
+    Create the weight vector of a GeneticPlayer, as used by the BatchGame.
+
+    Args:
+        player (GeneticPlayer): The player.
+
+    Returns:
+        np.ndarray: Array of weights, in the order of weight_names.
+    """
+    return player.vector(weight_names)
+
+
+def encode_mission(mission):
+    """
+    Encode a mission as a tuple of plain values.
+
+    Args:
+        mission (BaseMission): The mission.
+
+    Returns:
+        tuple: Mission kind, target player id (-1 if none), boolean array of required continents,
+            and whether an additional continent is required. A player mission targeting its own player
+            is encoded as the fallback base mission.
+    """
+    continents = np.zeros(6, dtype=bool)
+    if isinstance(mission, PlayerMission):
+        if mission.target_id == mission.player_id:
+            return MISSION_BASE, -1, continents, False
+        return MISSION_PLAYER, mission.target_id, continents, False
+    elif isinstance(mission, ContinentMission):
+        continents[list(mission.continents)] = True
+        return MISSION_CONTINENT, -1, continents, isinstance(mission, ExtraContinentMission)
+    elif isinstance(mission, TerritoryMission):
+        return MISSION_TERRITORY, -1, continents, False
+    return MISSION_BASE, -1, continents, False
+
+
+def encode_missions(n_players):
+    """
+    Encode all missions available for the given number of players as arrays.
+
+    Args:
+        n_players (int): Number of players in the game.
+
+    Returns:
+        tuple: Arrays of mission kinds, target player ids, required continents (boolean, one column per
+            continent) and whether an extra continent is required. Each has one row per mission.
+    """
+    kinds, targets, continents, extras = zip(*[encode_mission(m) for m in get_missions(n_players)])
+    return np.array(kinds), np.array(targets), np.array(continents), np.array(extras)
+
+
+class BatchGame(object):
+    """
+    The BatchGame plays many Risk games in lockstep. The state of all games is held in
+    arrays with one row per game, and every phase of a turn (reinforcement, attacks,
+    fortification, win checks) is executed as vectorized operations across all games
+    that are still running. Finished games are dropped from the state arrays, so they
+    stop costing anything.
+
+    Each seat in each game is played either by a random policy, which behaves like the
+    RandomPlayer, or by a weight-vector form of the GeneticPlayer. The rules follow
+    Game, Board and Cards; the games are statistically, not bitwise, equivalent.
+
+    Args:
+        owner (np.ndarray): Owner per game and territory, shape (games, 42).
+        armies (np.ndarray): Armies per game and territory, shape (games, 42).
+        missions (tuple): Mission kind, target, required continents and extra flag per game and
+            seat, as encoded by encode_missions, with shapes (games, players[, 6]).
+        weights (np.ndarray): Weight vectors per game and seat, shape (games, players, len(weight_names)).
+        genetic (np.ndarray): Boolean per game and seat, True if the seat is played by the genetic
+            policy, False if it is played by the random policy.
+        rng (np.random.RandomState): Random number generator.
+    """
+
+    def __init__(self, owner, armies, missions, weights, genetic, rng):
+        self.n_games, self.n_players = genetic.shape
+        self.owner = owner
+        self.armies = armies
+        self.cards = np.zeros((self.n_games, self.n_players, 3), dtype=int)
+        self.mission_kind, self.mission_target, self.mission_continents, self.mission_extra = missions
+        self.weights = weights
+        self.genetic = genetic
+        self.rng = rng
+        self.turn = np.zeros(self.n_games, dtype=int)
+        self.game_ids = np.arange(self.n_games)
+        self.winners = np.full(self.n_games, -1)
+        self.turns = np.zeros(self.n_games, dtype=int)
+
+    @classmethod
+    def create(cls, n_games, n_players, weights=None, genetic=None, seed=None):
+        """
+        Create a batch of new games, with randomly allocated territories and missions.
+
+        Args:
+            n_games (int): Number of games.
+            n_players (int): Number of players per game.
+            weights (np.ndarray): Weight vectors per game and seat. Defaults to zeros.
+            genetic (np.ndarray): Boolean per game and seat, True for genetic seats. Defaults to
+                True where weights are given, else False.
+            seed (int): Seed of the random number generator. Defaults to None.
+
+        Returns:
+            BatchGame: A batch of games, ready to initialize the armies.
+        """
+        rng = np.random.RandomState(seed)
+        if weights is None:
+            weights = np.zeros((n_games, n_players, len(weight_names)))
+            genetic = np.zeros((n_games, n_players), dtype=bool) if genetic is None else genetic
+        elif genetic is None:
+            genetic = np.ones((n_games, n_players), dtype=bool)
+        allocation = np.resize(np.arange(n_players), 42)
+        owner = allocation[np.argsort(rng.rand(n_games, 42), axis=1)]
+        armies = np.ones((n_games, 42), dtype=int)
+
+        kinds, targets, continents, extras = encode_missions(n_players)
+        chosen = np.argsort(rng.rand(n_games, len(kinds)), axis=1)[:, :n_players]
+        kind, target = kinds[chosen], targets[chosen]
+        kind[(kind == MISSION_PLAYER) & (target == np.arange(n_players))] = MISSION_BASE
+        missions = (kind, target, continents[chosen], extras[chosen])
+        return cls(owner, armies, missions, weights, genetic, rng)
+
+    @classmethod
+    def from_players(cls, pools, seed=None):
+        """
+        Create a batch of new games from pools of RandomPlayers and GeneticPlayers.
+
+        Args:
+            pools (list): List of player lists, one per game. All games must have the same number of players.
+            seed (int): Seed of the random number generator. Defaults to None.
+
+        Raises:
+            ValueError if a player is neither a RandomPlayer nor a GeneticPlayer.
+
+        Returns:
+            BatchGame: A batch of games, ready to initialize the armies.
+        """
+        weights = np.zeros((len(pools), len(pools[0]), len(weight_names)))
+        genetic = np.zeros((len(pools), len(pools[0])), dtype=bool)
+        for i, pool in enumerate(pools):
+            for j, player in enumerate(pool):
+                if isinstance(player, GeneticPlayer):
+                    weights[i, j], genetic[i, j] = weight_vector(player), True
+                elif not isinstance(player, RandomPlayer):
+                    raise ValueError('BatchGame: cannot play {p}, only Random- and GeneticPlayers.'.format(p=player))
+        return cls.create(len(pools), len(pools[0]), weights=weights, genetic=genetic, seed=seed)
+
+    @property
+    def current_player_id(self):
+        """
+        Return the player id of the current turn for every running game.
+
+        Returns:
+            np.ndarray: Player ids, one per running game.
+        """
+        return self.turn % self.n_players
+
+    def run(self, max_turns=1500):
+        """
+        Initialize the armies and play all games until they are won or reach the maximum number of turns.
+
+        Args:
+            max_turns (int): Maximum number of turns to play. Defaults to 1500.
+
+        Returns:
+            np.ndarray: The winning player id per game, -1 if a game has no winner.
+        """
+        self.initialize_armies()
+        for _ in range(max_turns):
+            if len(self.game_ids) == 0:
+                break
+            self.play_turn()
+        return self.winners
+
+    def initialize_armies(self):
+        """
+        Have all players place all starting armies on the board, one army per player per pass.
+        """
+        remaining = definitions.starting_armies[self.n_players] - self.territory_counts()
+        for _ in range(remaining.max()):
+            for player_id in range(self.n_players):
+                g = np.flatnonzero(remaining[:, player_id] > 0)
+                self.place(g, np.full(len(g), player_id), np.ones(len(g), dtype=int))
+                remaining[g, player_id] -= 1
+
+    def play_turn(self):
+        """
+        Play a turn in every running game, and finish the games that have been won.
+        """
+        g = np.arange(len(self.game_ids))
+        me = self.current_player_id
+        self.reinforce(g, me)
+        self.attack(g, me)
+        self.fortify(g, me)
+        self.next_turn()
+        self.turns[self.game_ids] += 1
+        won = self.has_won()
+        self.winners[self.game_ids] = np.where(won.any(axis=1), won.argmax(axis=1), -1)
+        self.finish(won.any(axis=1))
+
+    def finish(self, finished):
+        """
+        Drop finished games from the state arrays.
+
+        Args:
+            finished (np.ndarray): Boolean per running game, True if the game has finished.
+        """
+        keep = ~finished
+        for name in ('owner', 'armies', 'cards', 'mission_kind', 'mission_target', 'mission_continents',
+                     'mission_extra', 'weights', 'genetic', 'turn', 'game_ids'):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def next_turn(self):
+        """
+        Jump to the next turn in every running game, skipping dead players.
+        """
+        self.turn += 1
+        counts = self.territory_counts()
+        for _ in range(self.n_players):
+            dead = counts[np.arange(len(self.turn)), self.current_player_id] == 0
+            self.turn[dead] += 1
+
+    # ================== #
+    # == Board Queries == #
+    # ================== #
+
+    def territory_counts(self):
+        """
+        Count the territories of every player in every running game.
+
+        Returns:
+            np.ndarray: Territory counts, shape (games, players).
+        """
+        return (self.owner[:, None, :] == np.arange(self.n_players)[None, :, None]).sum(axis=2)
+
+    def has_won(self):
+        """
+        Check for every player in every running game whether he has won.
+
+        Returns:
+            np.ndarray: Boolean array of shape (games, players).
+        """
+        owned = self.owner[:, None, :] == np.arange(self.n_players)[None, :, None]
+        n_territories = owned.sum(axis=2)
+        n_mobile = (owned & (self.armies[:, None, :] > 1)).sum(axis=2)
+        owns_continent = owned.dot(continent_matrix.T) == continent_sizes
+        target_territories = n_territories[np.arange(len(n_territories))[:, None], self.mission_target]
+
+        kind = self.mission_kind
+        continents_done = np.all(owns_continent | ~self.mission_continents, axis=2)
+        extra_done = owns_continent.sum(axis=2) > self.mission_continents.sum(axis=2)
+        mission_done = np.select(
+            [kind == MISSION_BASE, kind == MISSION_TERRITORY, kind == MISSION_PLAYER],
+            [n_territories >= 24, n_mobile >= 18, target_territories == 0],
+            continents_done & (extra_done | ~self.mission_extra)
+        )
+        return (n_territories > 0) & (mission_done | (n_territories == 42))
+
+    def hostility(self, g):
+        """
+        Calculate which edges connect territories of different owners, and the number of hostile
+        armies surrounding every territory in the given games.
+
+        Args:
+            g (np.ndarray): Indices of the running games.
+
+        Returns:
+            tuple: Boolean array of hostile edges, shape (games, edges), and array of hostile armies
+                per territory, shape (games, 42).
+        """
+        hostile = self.owner[g][:, edge_from] != self.owner[g][:, edge_to]
+        return hostile, (hostile * self.armies[g][:, edge_to]).dot(edge_matrix)
+
+    def features(self, g, me):
+        """
+        Calculate the territory features the GeneticPlayer uses, for every territory in the given games,
+        from the perspective of the given players. See SmartPlayer for the definitions.
+
+        Args:
+            g (np.ndarray): Indices of the running games.
+            me (np.ndarray): Player id per game.
+
+        Returns:
+            tuple: Arrays of shape (games, 42) with the direct bonus, continent value, mission value,
+                army vantage and territory vantage of every territory.
+        """
+        owner, armies = self.owner[g], self.armies[g]
+        mine = owner == me[:, None]
+        counts = mine.dot(continent_matrix.T)
+        fraction = counts / continent_sizes.astype(float)
+        foreign = (continent_sizes - counts)[:, territory_continents]
+        direct_bonus = np.where((foreign == 0) & mine | (foreign == 1) & ~mine, territory_bonuses / 7., 0.)
+        continent_value = fraction[:, territory_continents] * territory_bonuses
+
+        hostile, hostile_armies = self.hostility(g)
+        army_vantage = hostile_armies / (hostile_armies + armies)
+        territory_vantage = hostile.dot(edge_matrix) / degrees
+
+        kind, target = self.mission_kind[g, me], self.mission_target[g, me]
+        continents, extra = self.mission_continents[g, me], self.mission_extra[g, me]
+        other_owned = np.any((counts == continent_sizes) & ~continents, axis=1)
+        mission_value = np.select(
+            [kind[:, None] == MISSION_PLAYER, kind[:, None] == MISSION_CONTINENT],
+            [owner == target[:, None],
+             np.where(continents[:, territory_continents], 1.,
+                      np.where((extra & ~other_owned)[:, None], fraction[:, territory_continents], 0.))],
+            (mine.sum(axis=1) < 24)[:, None]
+        ).astype(float)
+        return direct_bonus, continent_value, mission_value, army_vantage, territory_vantage
+
+    def policy_split(self, g, me):
+        """
+        Split games into those where the current seat is played by the random and the genetic policy.
+
+        Args:
+            g (np.ndarray): Indices of the running games.
+            me (np.ndarray): Player id per game.
+
+        Returns:
+            tuple: Boolean arrays (random, genetic) over the given games.
+        """
+        genetic = self.genetic[g, me]
+        return ~genetic, genetic
+
+    @staticmethod
+    def random_choice(rng, valid):
+        """
+        Choose a random valid column for every row.
+
+        Args:
+            rng (np.random.RandomState): Random number generator.
+            valid (np.ndarray): Boolean array of valid options, shape (rows, options).
+
+        Returns:
+            np.ndarray: Chosen column per row.
+        """
+        return np.where(valid, rng.rand(*valid.shape), -1.).argmax(axis=1)
+
+    # ================== #
+    # == Turn methods == #
+    # ================== #
+
+    def place(self, g, me, n):
+        """
+        Have players place armies one-by-one on their territories.
+
+        Args:
+            g (np.ndarray): Indices of the running games.
+            me (np.ndarray): Player id per game.
+            n (np.ndarray): Number of armies to place per game.
+        """
+        if len(g) == 0:
+            return
+        mine = self.owner[g] == me[:, None]
+        _, is_genetic = self.policy_split(g, me)
+        if is_genetic.any():
+            direct_bonus, continent_value, mission_value, _, territory_vantage = self.features(g, me)
+            _, hostile_armies = self.hostility(g)
+            w = self.weights[g, me]
+            partial = (direct_bonus * w[:, [W['re_dbonus_wgt']]] +
+                       continent_value * w[:, [W['re_ibonus_wgt']]] +
+                       mission_value * w[:, [W['re_mission_wgt']]] +
+                       territory_vantage * w[:, [W['re_tvantage_wgt']]])
+            territory_mission = (self.mission_kind[g, me] == MISSION_TERRITORY) & (mine.sum(axis=1) >= 18)
+        for i in range(n.max()):
+            target = self.random_choice(self.rng, mine)
+            if is_genetic.any():
+                armies = self.armies[g]
+                options = mine.copy()
+                doubles = options & (armies < 2)
+                restrict = territory_mission & doubles.any(axis=1)
+                options[restrict] = doubles[restrict]
+                weight = partial + hostile_armies / (hostile_armies + armies) * w[:, [W['re_avantage_wgt']]]
+                target = np.where(is_genetic, np.where(options, weight, -np.inf).argmax(axis=1), target)
+            active = n > i
+            self.armies[g[active], target[active]] += 1
+
+    def reinforce(self, g, me):
+        """
+        Handle the reinforcement phase, including the turning in of cards.
+
+        Args:
+            g (np.ndarray): Indices of the running games.
+            me (np.ndarray): Player id per game.
+        """
+        mine = self.owner[g] == me[:, None]
+        counts = mine.dot(continent_matrix.T)
+        bonus = ((counts == continent_sizes) * continent_bonuses).sum(axis=1)
+        self.place(g, me, np.maximum(3, mine.sum(axis=1) // 3) + bonus)
+
+        cards = self.cards[g, me]
+        complete = np.all(cards[:, None, :] >= card_set_cards[None, :, :], axis=2)
+        obligatory = cards.sum(axis=1) > 4
+        _, is_genetic = self.policy_split(g, me)
+        random_set = self.random_choice(self.rng, complete)
+        best_set = 3 - complete[:, ::-1].argmax(axis=1)
+        turn_in = complete.any(axis=1) & np.where(
+            is_genetic,
+            obligatory | (card_set_armies[best_set] >= self.weights[g, me, W['turn_in_cutoff']]),
+            obligatory | (self.rng.rand(len(g)) <= 0.5)
+        )
+        card_set = np.where(is_genetic, best_set, random_set)
+        self.cards[g[turn_in], me[turn_in]] -= card_set_cards[card_set[turn_in]]
+        self.place(g[turn_in], me[turn_in], card_set_armies[card_set[turn_in]])
+
+    def attack(self, g, me):
+        """
+        Handle the attack phase. Every round, each game in which the player still wants to attack
+        resolves one dice roll.
+
+        Args:
+            g (np.ndarray): Indices of the running games.
+            me (np.ndarray): Player id per game.
+        """
+        won_yet = np.zeros(len(g), dtype=bool)
+        active = np.ones(len(g), dtype=bool)
+        while active.any():
+            a = np.flatnonzero(active)
+            ga, ma = g[a], me[a]
+            owner, armies = self.owner[ga], self.armies[ga]
+            mine = owner == ma[:, None]
+            valid = mine[:, edge_from] & (armies[:, edge_from] > 1) & ~mine[:, edge_to]
+            _, is_genetic = self.policy_split(ga, ma)
+
+            edge = self.random_choice(self.rng, valid)
+            stop = (self.rng.rand(len(a)) > 0.9) & ((armies * mine).sum(axis=1) < 50)
+            if is_genetic.any():
+                from_armies, to_armies = armies[:, edge_from], armies[:, edge_to]
+                direct_bonus, _, mission_value, _, _ = self.features(ga, ma)
+                w = self.weights[ga, ma]
+                n_att = from_armies - 1.
+                conquering_chance = battle.table().win_probability(n_att, to_armies)
+                chance_ratio = battle.chance_ratios[np.minimum(to_armies - 1, 1), np.clip(from_armies - 2, 0, 2)]
+                weight = (direct_bonus[:, edge_to] * w[:, [W['att_bonus_wgt']]] +
+                          chance_ratio * w[:, [W['att_chance_wgt']]] +
+                          conquering_chance * w[:, [W['att_conqc_wgt']]] +
+                          mission_value[:, edge_to] * w[:, [W['att_mission_wgt']]] +
+                          n_att * w[:, [W['att_narmies_wgt']]])
+                weight = np.where(valid, weight, -np.inf)
+                best = weight.argmax(axis=1)
+                cutoff = w[:, W['att_cutoff']] + np.where(won_yet[a], 0., w[:, W['att_cutoff_win']])
+                edge = np.where(is_genetic, best, edge)
+                stop = np.where(is_genetic, weight[np.arange(len(a)), best] < cutoff, stop)
+            stop |= ~valid.any(axis=1)
+            active[a[stop]] = False
+
+            go = ~stop
+            won_yet[a[go]] |= self.fight(ga[go], ma[go], edge_from[edge[go]], edge_to[edge[go]])
+
+        receive = np.flatnonzero(won_yet)
+        self.cards[g[receive], me[receive], self.rng.randint(0, 3, len(receive))] += 1
+
+    def fight(self, g, me, from_territory, to_territory):
+        """
+        Resolve one dice roll per game, attacking with all armies but one.
+
+        Args:
+            g (np.ndarray): Indices of the running games.
+            me (np.ndarray): Attacking player id per game.
+            from_territory (np.ndarray): Attacking territory per game.
+            to_territory (np.ndarray): Defending territory per game.
+
+        Returns:
+            np.ndarray: Boolean per game, True if the defending territory was conquered.
+        """
+        attackers = self.armies[g, from_territory] - 1
+        defenders = self.armies[g, to_territory]
+        n_attack_dices, n_defend_dices = np.minimum(attackers, 3), np.minimum(defenders, 2)
+        attack_dices = self.rng.randint(1, 7, (len(g), 3)) * (np.arange(3) < n_attack_dices[:, None])
+        defend_dices = self.rng.randint(1, 7, (len(g), 2)) * (np.arange(2) < n_defend_dices[:, None])
+        attack_dices = -np.sort(-attack_dices, axis=1)[:, :2]
+        defend_dices = -np.sort(-defend_dices, axis=1)
+        pairs = np.arange(2) < np.minimum(n_attack_dices, n_defend_dices)[:, None]
+        att_wins = (pairs & (attack_dices > defend_dices)).sum(axis=1)
+        def_wins = (pairs & (attack_dices <= defend_dices)).sum(axis=1)
+
+        conquered = defenders == att_wins
+        c, s = conquered, ~conquered
+        self.armies[g[c], from_territory[c]] -= attackers[c]
+        self.armies[g[c], to_territory[c]] = attackers[c] - def_wins[c]
+        self.owner[g[c], to_territory[c]] = me[c]
+        self.armies[g[s], from_territory[s]] -= def_wins[s]
+        self.armies[g[s], to_territory[s]] -= att_wins[s]
+        return conquered
+
+    def fortify(self, g, me):
+        """
+        Handle the fortification phase.
+
+        Args:
+            g (np.ndarray): Indices of the running games.
+            me (np.ndarray): Player id per game.
+        """
+        owner, armies = self.owner[g], self.armies[g]
+        mine = owner == me[:, None]
+        valid = mine[:, edge_from] & (armies[:, edge_from] > 1) & mine[:, edge_to]
+        _, is_genetic = self.policy_split(g, me)
+        rows = np.arange(len(g))
+        from_armies = armies[:, edge_from]
+
+        edge = self.random_choice(self.rng, valid)
+        n = (self.rng.rand(len(g)) * (from_armies[rows, edge] - 1)).astype(int) + 1
+        go = valid.any(axis=1)
+        if is_genetic.any():
+            direct_bonus, _, mission_value, army_vantage, territory_vantage = self.features(g, me)
+            w = self.weights[g, me]
+            weight = ((army_vantage[:, edge_from] - army_vantage[:, edge_to]) * w[:, [W['ft_avantage_wgt']]] +
+                      (territory_vantage[:, edge_from] - territory_vantage[:, edge_to]) * w[:, [W['ft_tvantage_wgt']]] +
+                      (mission_value[:, edge_from] - mission_value[:, edge_to]) * w[:, [W['ft_mission_wgt']]] +
+                      (direct_bonus[:, edge_from] - direct_bonus[:, edge_to]) * w[:, [W['ft_bonus_wgt']]] +
+                      (from_armies - 1) * w[:, [W['ft_narmies_wgt']]])
+            weight = np.where(valid, weight, -np.inf)
+            best = weight.argmax(axis=1)
+            edge = np.where(is_genetic, best, edge)
+            n = np.where(is_genetic, from_armies[rows, best] - 1, n)
+            go &= ~is_genetic | (weight[rows, best] >= w[:, W['ft_min_wgt']])
+        self.armies[g[go], edge_from[edge[go]]] -= n[go]
+        self.armies[g[go], edge_to[edge[go]]] += n[go]
@@ -0,0 +1,252 @@
+import bisect
+import itertools
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from cache import LRUCache
+
+_default_table = None
+_distributions = LRUCache(maxsize=4096)
+
+
+def roll_outcomes(n_attack_dices, n_defend_dices):
+    """
+    Calculate the exact outcome distribution of a single dice roll, see Board.fight.
+
+    Args:
+        n_attack_dices (int): Number of attacking dices [1, 3].
+        n_defend_dices (int): Number of defending dices [1, 2].
+
+    Returns:
+        list: List of tuples (lost attackers, lost defenders, probability).
+    """
+    counts = {}
+    for dices in itertools.product(range(1, 7), repeat=n_attack_dices + n_defend_dices):
+        attack_dices = sorted(dices[:n_attack_dices], reverse=True)
+        defend_dices = sorted(dices[n_attack_dices:], reverse=True)
+        wins = [att_d > def_d for att_d, def_d in zip(attack_dices, defend_dices)]
+        outcome = (wins.count(False), wins.count(True))
+        counts[outcome] = counts.get(outcome, 0) + 1
+    total = 6. ** (n_attack_dices + n_defend_dices)
+    return sorted((att_loss, def_loss, n / total) for (att_loss, def_loss), n in counts.items())
+
+
+_roll_outcomes = {(a, d): roll_outcomes(a, d) for a in (1, 2, 3) for d in (1, 2)}
+
+chance_ratios = np.array([[
+    sum(p * att_loss for att_loss, _, p in _roll_outcomes[a, d]) /
+    sum(p * def_loss for _, def_loss, p in _roll_outcomes[a, d])
+    for a in (1, 2, 3)] for d in (1, 2)])
+
+
+def state_outcomes(attackers, defenders):
+    """
+    Calculate the outcome distribution of a single dice roll, attacking with all attackers.
+
+    Args:
+        attackers (int): Number of attacking armies.
+        defenders (int): Number of defending armies.
+
+    Returns:
+        list: List of tuples (lost attackers, lost defenders, probability).
+    """
+    return _roll_outcomes[min(attackers, 3), min(defenders, 2)]
+
+
+def outcome_distribution(attackers, defenders, stop=0):
+    """
+    Calculate the distribution of the final state of a battle, in which the attacker keeps attacking
+    with all attackers until the territory is conquered or at most `stop` attackers are left. The
+    distribution is found by propagating the probability mass through the absorbing chain, from the
+    initial state to the absorbing states. Distributions are memoized.
+
+    Args:
+        attackers (int): Number of attacking armies.
+        defenders (int): Number of defending armies.
+        stop (int): Stop attacking when at most this number of attackers is left. Defaults to 0.
+
+    Returns:
+        tuple: List of final states (attackers left, defenders left), and a list with the cumulative
+            probabilities of these states.
+    """
+    return _distributions.lookup((attackers, defenders, stop),
+                                 lambda: _outcome_distribution(attackers, defenders, stop))
+
+
+def _outcome_distribution(attackers, defenders, stop):
+    """ Calculate the final state distribution of a battle, see outcome_distribution. """
+    transient = {(attackers, defenders): 1.}
+    final = {}
+    for total in range(attackers + defenders, 0, -1):
+        for a in range(min(attackers, total), total - defenders - 1, -1):
+            d = total - a
+            mass = transient.pop((a, d), 0.)
+            if mass == 0.:
+                continue
+            if d == 0 or a <= stop:
+                final[a, d] = final.get((a, d), 0.) + mass
+                continue
+            for att_loss, def_loss, p in state_outcomes(a, d):
+                key = (a - att_loss, d - def_loss)
+                transient[key] = transient.get(key, 0.) + p * mass
+    states = sorted(final)
+    return states, list(np.cumsum([final[state] for state in states]))
+
+
+def sample_outcome(attackers, defenders, stop=0, r=None):
+    """
+    Sample the final state of a battle with a single random draw, see outcome_distribution.
+
+    Args:
+        attackers (int): Number of attacking armies.
+        defenders (int): Number of defending armies.
+        stop (int): Stop attacking when at most this number of attackers is left. Defaults to 0.
+        r (float): Uniform random number in [0, 1>. Defaults to a new random draw.
+
+    Returns:
+        tuple: Final state (attackers left, defenders left).
+    """
+    states, cumulative = outcome_distribution(attackers, defenders, stop)
+    r = random.random() if r is None else r
+    return states[min(bisect.bisect_right(cumulative, r * cumulative[-1]), len(states) - 1)]
+
+
+class BattleTable(object):
+    """
+    The BattleTable holds the exact outcome statistics of battles, in which the attacker keeps
+    attacking with all attacking armies until either the defending territory is conquered or no
+    attacking armies are left. The statistics are computed once by solving the absorbing Markov
+    chain over (attackers, defenders) states, and are cached on disk as a compact float32 array,
+    which is memory-mapped on load.
+
+    For every number of attacking armies (the armies on the territory minus one) and defending
+    armies up to the bounds, the table provides:
+     - the probability to conquer the territory,
+     - the expected number of lost attacking armies,
+     - the expected number of surviving attacking armies (zero if the battle is lost).
+    Lookups beyond the bounds are clipped to the bounds.
+
+    Args:
+        max_attackers (int): Maximum number of attacking armies. Defaults to 200.
+        max_defenders (int): Maximum number of defending armies. Defaults to 200.
+        path (str): Path of the cache file. Defaults to a file in the temporary directory.
+    """
+
+    def __init__(self, max_attackers=200, max_defenders=200, path=None):
+        self.max_attackers = max_attackers
+        self.max_defenders = max_defenders
+        self.path = path or os.path.join(
+            tempfile.gettempdir(), 'risk_battle_{a}x{d}.npy'.format(a=max_attackers, d=max_defenders))
+        self.data = self.load()
+
+    def load(self):
+        """
+        Load the table from the cache file, computing and saving it if necessary.
+
+        Returns:
+            np.ndarray: Memory-mapped array of shape (3, max_attackers + 1, max_defenders + 1).
+        """
+        shape = (3, self.max_attackers + 1, self.max_defenders + 1)
+        if os.path.exists(self.path):
+            data = np.load(self.path, mmap_mode='r')
+            if data.shape == shape:
+                return data
+        tmp_path = '{path}.{pid}.tmp.npy'.format(path=self.path, pid=os.getpid())
+        np.save(tmp_path, self.compute(self.max_attackers, self.max_defenders).astype(np.float32))
+        os.rename(tmp_path, self.path)
+        return np.load(self.path, mmap_mode='r')
+
+    @staticmethod
+    def compute(max_attackers, max_defenders):
+        """
+        Solve the battle chain for all states up to the bounds.
+
+        Args:
+            max_attackers (int): Maximum number of attacking armies.
+            max_defenders (int): Maximum number of defending armies.
+
+        Returns:
+            np.ndarray: Array of shape (3, max_attackers + 1, max_defenders + 1) with the win probability,
+                expected attacker losses and expected surviving attackers.
+        """
+        win = np.zeros((max_attackers + 1, max_defenders + 1))
+        loss = np.zeros_like(win)
+        survivors = np.zeros_like(win)
+        win[:, 0] = 1.
+        survivors[:, 0] = np.arange(max_attackers + 1)
+        for a in range(1, max_attackers + 1):
+            for d in range(1, max_defenders + 1):
+                for att_loss, def_loss, p in state_outcomes(a, d):
+                    win[a, d] += p * win[a - att_loss, d - def_loss]
+                    loss[a, d] += p * (att_loss + loss[a - att_loss, d - def_loss])
+                    survivors[a, d] += p * survivors[a - att_loss, d - def_loss]
+        return np.array([win, loss, survivors])
+
+    def index(self, attackers, defenders):
+        """
+        Convert numbers of armies into clipped table indices.
+
+        Args:
+            attackers (int/array-like): Number(s) of attacking armies.
+            defenders (int/array-like): Number(s) of defending armies.
+
+        Returns:
+            tuple: Arrays of attacker and defender indices.
+        """
+        return (np.clip(attackers, 0, self.max_attackers).astype(int),
+                np.clip(defenders, 0, self.max_defenders).astype(int))
+
+    def win_probability(self, attackers, defenders):
+        """
+        Look up the probability to conquer a territory.
+
+        Args:
+            attackers (int/array-like): Number(s) of attacking armies.
+            defenders (int/array-like): Number(s) of defending armies.
+
+        Returns:
+            float/np.ndarray: Probability to conquer the territory [0, 1].
+        """
+        return self.data[0][self.index(attackers, defenders)]
+
+    def expected_loss(self, attackers, defenders):
+        """
+        Look up the expected number of attacking armies lost in the battle.
+
+        Args:
+            attackers (int/array-like): Number(s) of attacking armies.
+            defenders (int/array-like): Number(s) of defending armies.
+
+        Returns:
+            float/np.ndarray: Expected number of lost attacking armies.
+        """
+        return self.data[1][self.index(attackers, defenders)]
+
+    def expected_survivors(self, attackers, defenders):
+        """
+        Look up the expected number of attacking armies left after the battle.
+
+        Args:
+            attackers (int/array-like): Number(s) of attacking armies.
+            defenders (int/array-like): Number(s) of defending armies.
+
+        Returns:
+            float/np.ndarray: Expected number of surviving attacking armies.
+        """
+        return self.data[2][self.index(attackers, defenders)]
+
+
+def table():
+    """
+    Get the default BattleTable, loading it on first use.
+
+    Returns:
+        BattleTable: The default table.
+    """
+    global _default_table
+    if _default_table is None:
+        _default_table = BattleTable()
+    return _default_table
@@ -0,0 +1,208 @@
+from collections import defaultdict, deque
+
+import definitions
+from board import CHANGE_LOG_SIZE, Board, Move, Territory, zobrist_key
+from randomsource import RandomSource
+
+_popcounts = [bin(i).count('1') for i in range(1 << 16)]
+
+
+def popcount(mask):
+    """
+    Count the number of set bits in a territory mask, by looking up its 16-bit words in a table.
+
+    Args:
+        mask (int): Territory mask.
+
+    Returns:
+        int: Number of territories in the mask.
+    """
+    return _popcounts[mask & 0xFFFF] + _popcounts[mask >> 16 & 0xFFFF] + _popcounts[mask >> 32]
+
+
+def territory_ids(mask):
+    """
+    Create a generator of the territory ids in a mask, in increasing order.
+
+    Args:
+        mask (int): Territory mask.
+
+    Returns:
+        generator: Generator of territory ids.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class BitBoard(Board):
+    """
+    The BitBoard is a Board backend which represents the state of the board
+    as 42-bit territory masks: one ownership mask per player and a mask of
+    all mobile territories (territories with more than one army). The masks
+    replace the counters and the edge index of the Board: they are the only
+    structures maintained next to the data, so a change of a territory only
+    flips two bits. Together with the static neighbor and continent masks
+    from the definitions, counts, continent checks, frontiers and moves
+    reduce to a handful of AND/OR/popcount operations.
+
+    Args:
+        data (list): a sorted list of tuples describing the state of the
+            board, see Board.
+        rng (RandomSource): Source of the dices of the board. Defaults to a new RandomSource.
+    """
+
+    def __init__(self, data, rng=None):
+        self.data = data
+        self.rng = rng or RandomSource()
+        self.journal = []
+        self.open_snapshots = 0
+        self.state_hash = reduce(lambda h, t: h ^ zobrist_key(t), data, 0)
+        self.version = 0
+        self.changes = deque(maxlen=CHANGE_LOG_SIZE)
+        self.owner_masks, self.mobile_mask = self._build_masks()
+
+    # ====================== #
+    # == Neighbor Methods == #
+    # ====================== #
+
+    def hostile_neighbors(self, territory_id):
+        mask = definitions.territory_neighbor_masks[territory_id] & ~self.owner_masks[self.owner(territory_id)]
+        return (self.data[tid] for tid in territory_ids(mask))
+
+    def friendly_neighbors(self, territory_id):
+        mask = definitions.territory_neighbor_masks[territory_id] & self.owner_masks[self.owner(territory_id)]
+        return (self.data[tid] for tid in territory_ids(mask))
+
+    def n_hostile_neighbors(self, territory_id):
+        mask = definitions.territory_neighbor_masks[territory_id] & ~self.owner_masks[self.owner(territory_id)]
+        return popcount(mask)
+
+    # ======================= #
+    # == Continent Methods == #
+    # ======================= #
+
+    def n_continents(self, player_id):
+        owned = self.owner_masks[player_id]
+        return len([cid for cid, mask in definitions.continent_masks.items() if mask & owned == mask])
+
+    def owns_continent(self, player_id, continent_id):
+        mask = definitions.continent_masks[continent_id]
+        return self.owner_masks[player_id] & mask == mask
+
+    def continent_fraction(self, continent_id, player_id):
+        n_owned = popcount(self.owner_masks[player_id] & definitions.continent_masks[continent_id])
+        return float(n_owned) / definitions.continent_sizes[continent_id]
+
+    def num_foreign_continent_territories(self, continent_id, player_id):
+        return popcount(definitions.continent_masks[continent_id] & ~self.owner_masks[player_id])
+
+    # ==================== #
+    # == Action Methods == #
+    # ==================== #
+
+    def possible_attacks(self, player_id):
+        owned = self.owner_masks[player_id]
+        return self._moves(owned, ~owned)
+
+    def possible_fortifications(self, player_id):
+        owned = self.owner_masks[player_id]
+        return self._moves(owned, owned)
+
+    def frontier(self, player_id):
+        owned = self.owner_masks[player_id]
+        return [tid for tid in territory_ids(owned) if definitions.territory_neighbor_masks[tid] & ~owned]
+
+    def _moves(self, owned, targets):
+        """
+        Assemble the Moves from the mobile territories in a mask to their neighbors in another mask, ordered by
+        territory IDs.
+
+        Args:
+            owned (int): Territory mask of the player.
+            targets (int): Territory mask of the territories that can be moved to.
+
+        Returns:
+            list: List of Moves.
+        """
+        data = self.data
+        neighbor_ids, neighbor_masks = definitions.territory_neighbor_ids, definitions.territory_neighbor_masks
+        moves = []
+        for from_tid in territory_ids(owned & self.mobile_mask):
+            if not neighbor_masks[from_tid] & targets:
+                continue
+            from_armies = data[from_tid].armies
+            for to_tid in neighbor_ids[from_tid]:
+                if targets >> to_tid & 1:
+                    to_territory = data[to_tid]
+                    moves.append(Move(from_tid, from_armies, to_tid, to_territory.player_id, to_territory.armies))
+        return moves
+
+    # ======================= #
+    # == Territory Methods == #
+    # ======================= #
+
+    def n_armies(self, player_id):
+        data = self.data
+        return sum(data[tid].armies for tid in territory_ids(self.owner_masks[player_id]))
+
+    def n_mobile(self, player_id):
+        return popcount(self.owner_masks[player_id] & self.mobile_mask)
+
+    def n_territories(self, player_id):
+        return popcount(self.owner_masks[player_id])
+
+    def territories_of(self, player_id):
+        return list(territory_ids(self.owner_masks[player_id]))
+
+    def mobile(self, player_id):
+        return (self.data[tid] for tid in territory_ids(self.owner_masks[player_id] & self.mobile_mask))
+
+    def _update(self, territory_id, player_id, armies):
+        territory = Territory(territory_id, player_id, armies)
+        previous = self.data[territory_id]
+        if self.open_snapshots:
+            self.journal.append(previous)
+        self.state_hash ^= zobrist_key(previous) ^ zobrist_key(territory)
+        self.data[territory_id] = territory
+        bit = 1 << territory_id
+        self.owner_masks[previous.player_id] &= ~bit
+        self.owner_masks[player_id] |= bit
+        if armies > 1:
+            self.mobile_mask |= bit
+        else:
+            self.mobile_mask &= ~bit
+        self.version += 1
+        self.changes.append((self.version, territory_id, previous.player_id != player_id))
+
+    def _build_masks(self):
+        """
+        Compute the ownership masks and the mobile mask from the state of the board, without touching the
+        maintained ones.
+
+        Returns:
+            tuple: Ownership mask per player, and the mobile mask.
+        """
+        owner_masks = defaultdict(int)
+        mobile_mask = 0
+        for tid, pid, armies in self.data:
+            owner_masks[pid] |= 1 << tid
+            if armies > 1:
+                mobile_mask |= 1 << tid
+        return owner_masks, mobile_mask
+
+    def check_consistency(self):
+        """
+        Check the maintained masks against a rebuild from scratch. The maintained masks are left as is.
+
+        Raises:
+            ValueError if the masks are inconsistent with the state of the board.
+        """
+        owner_masks, mobile_mask = self._build_masks()
+        if {k: v for k, v in self.owner_masks.items() if v} != dict(owner_masks):
+            raise ValueError('BitBoard: inconsistent ownership masks: {old} != {new}'
+                             .format(old=dict(self.owner_masks), new=dict(owner_masks)))
+        if self.mobile_mask != mobile_mask:
+            raise ValueError('BitBoard: inconsistent mobile mask: {old} != {new}'
+                             .format(old=self.mobile_mask, new=mobile_mask))
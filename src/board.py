@@ -1,14 +1,56 @@
 import os
 import random
-from collections import namedtuple
+from collections import Counter, defaultdict, deque, namedtuple
 
 import matplotlib.pyplot as plt
 
+import battle
 import definitions
+from randomsource import RandomSource
 
 Territory = namedtuple('Territory', ['territory_id', 'player_id', 'armies'])
 Move = namedtuple('Attack', ['from_territory_id', 'from_armies', 'to_territory_id', 'to_player_id', 'to_armies'])
 
+MAX_PLAYERS = max(definitions.starting_armies)
+ZOBRIST_ARMIES = 64
+CHANGE_LOG_SIZE = 64
+_zobrist_random = random.Random(42)
+zobrist_keys = [_zobrist_random.getrandbits(64) for _ in range(42 * MAX_PLAYERS * ZOBRIST_ARMIES)]
+
+
+def _mix64(x):
+    """
+    Scramble an integer into a 64-bit key (the SplitMix64 finalizer).
+
+    Args:
+        x (int): The integer.
+
+    Returns:
+        int: 64-bit key.
+    """
+    x = (x + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return x ^ (x >> 31)
+
+
+def zobrist_key(territory):
+    """
+    Get the Zobrist key of a territory state. Keys of army counts below
+    ZOBRIST_ARMIES come from a table; larger army counts get a key derived
+    from the exact count, so every territory state has its own key.
+
+    Args:
+        territory (Territory): The territory state.
+
+    Returns:
+        int: 64-bit key.
+    """
+    tid, pid, armies = territory
+    if armies < ZOBRIST_ARMIES:
+        return zobrist_keys[(tid * MAX_PLAYERS + pid) * ZOBRIST_ARMIES + armies]
+    return _mix64(((tid * MAX_PLAYERS + pid) << 32) | armies)
+
 
 class Board(object):
     """
@@ -24,25 +66,64 @@ class Board(object):
             - pid (int): the player id of the owner of the territory,
             - n_armies (int): the number of armies on the territory.
             The list is sorted by the tid, and should be complete.
+        rng (RandomSource): Source of the dices of the board. Defaults to a new RandomSource.
+
+    Next to the data, the Board keeps running counters of the number of
+    territories, armies and mobile territories per player, and of the
+    number of territories per player and continent. These are updated on
+    every change of the board, such that the aggregate queries are O(1).
+
+    Changes can be undone through snapshots: while a snapshot is open, the
+    previous state of every changed territory is recorded in a journal, and
+    reverting the snapshot restores it in O(changed territories). This makes
+    lookahead possible without copying the board.
+
+    The possible moves are maintained incrementally as well: per player, the
+    Board keeps the frontier (owned territories with a hostile neighbor), the
+    attack edges and the fortification edges. A change of a territory only
+    affects the edges to and from its neighbors, so move lists are assembled
+    without scanning the board.
+
+    Finally, the Board keeps a 64-bit Zobrist hash of its state, which can
+    be used as a cheap key for caches of per-state values, and a version
+    which is incremented on every change of a territory. The most recent
+    changes are logged, such that derived values can be updated instead of
+    recomputed, see changes_since.
     """
 
-    def __init__(self, data):
+    def __init__(self, data, rng=None):
         self.data = data
+        self.rng = rng or RandomSource()
+        self.territory_counts = Counter()
+        self.army_counts = Counter()
+        self.mobile_counts = Counter()
+        self.continent_counts = Counter()
+        self.journal = []
+        self.open_snapshots = 0
+        self.state_hash = 0
+        self.version = 0
+        self.changes = deque(maxlen=CHANGE_LOG_SIZE)
+        for territory in data:
+            self._count(territory, 1)
+        self._index_all()
 
     @classmethod
-    def create(cls, n_players):
+    def create(cls, n_players, rng=None):
         """
         Create a Board and randomly allocate the territories. Place one army on each territory.
         
         Args:
             n_players (int): Number of players.
+            rng (RandomSource): Source of random numbers. Defaults to a new RandomSource.
                 
         Returns:
             Board: A board with territories randomly allocated to the players.
         """
+        rng = rng or RandomSource()
         allocation = (range(n_players) * 42)[0:42]
-        random.shuffle(allocation)
-        return cls([Territory(territory_id=tid, player_id=pid, armies=1) for tid, pid in enumerate(allocation)])
+        rng.shuffle(allocation)
+        return cls([Territory(territory_id=tid, player_id=pid, armies=1) for tid, pid in enumerate(allocation)],
+                   rng=rng)
 
     # ====================== #
     # == Neighbor Methods == #
@@ -58,8 +139,7 @@ class Board(object):
         Returns:
             generator: Generator of Territories.
         """
-        neighbor_ids = definitions.territory_neighbors[territory_id]
-        return (t for t in self.data if t.territory_id in neighbor_ids)
+        return (self.data[nid] for nid in definitions.territory_neighbor_ids[territory_id])
 
     def hostile_neighbors(self, territory_id):
         """
@@ -73,8 +153,7 @@ class Board(object):
             generator: Generator of Territories.
         """
         player_id = self.owner(territory_id)
-        neighbor_ids = definitions.territory_neighbors[territory_id]
-        return (t for t in self.data if (t.player_id != player_id and t.territory_id in neighbor_ids))
+        return (t for t in self.neighbors(territory_id) if t.player_id != player_id)
 
     def friendly_neighbors(self, territory_id):
         """
@@ -88,8 +167,32 @@ class Board(object):
             generator: Generator of tuples of the form (territory_id, player_id, armies).
         """
         player_id = self.owner(territory_id)
-        neighbor_ids = definitions.territory_neighbors[territory_id]
-        return (t for t in self.data if (t.player_id == player_id and t.territory_id in neighbor_ids))
+        return (t for t in self.neighbors(territory_id) if t.player_id == player_id)
+
+    def n_hostile_neighbors(self, territory_id):
+        """
+        Count the neighbors of a territory that are owned by another player.
+
+        Args:
+            territory_id (int): ID of the territory.
+
+        Returns:
+            int: Number of hostile neighbors.
+        """
+        return self.hostile_counts[territory_id]
+
+    def is_neighbor(self, territory_id, other_id):
+        """
+        Check if two territories share a border.
+
+        Args:
+            territory_id (int): ID of the territory.
+            other_id (int): ID of the other territory.
+
+        Returns:
+            bool: True if the territories are neighbors.
+        """
+        return bool(definitions.territory_neighbor_masks[territory_id] >> other_id & 1)
 
     # ======================= #
     # == Continent Methods == #
@@ -117,7 +220,8 @@ class Board(object):
         Returns:
             int: Number of continents owned by the player.
         """
-        return len([continent_id for continent_id in range(6) if self.owns_continent(player_id, continent_id)])
+        return len([continent_id for continent_id in range(6)
+                    if self.continent_counts[player_id, continent_id] == definitions.continent_sizes[continent_id]])
 
     def owns_continent(self, player_id, continent_id):
         """
@@ -130,7 +234,7 @@ class Board(object):
         Returns:
             bool: True if the player owns all of the continent's territories.
         """
-        return all((t.player_id == player_id for t in self.continent(continent_id)))
+        return self.continent_counts[player_id, continent_id] == definitions.continent_sizes[continent_id]
 
     def continent_owner(self, continent_id):
         """
@@ -143,10 +247,8 @@ class Board(object):
         Returns:
             int/None: Player_id if a player owns all territories, else None.
         """
-        pids = set([t.player_id for t in self.continent(continent_id)])
-        if len(pids) == 1:
-            return pids.pop()
-        return None
+        player_id = self.owner(definitions.continent_territories[continent_id][0])
+        return player_id if self.owns_continent(player_id, continent_id) else None
 
     def continent_fraction(self, continent_id, player_id):
         """
@@ -159,9 +261,7 @@ class Board(object):
         Returns:
             float: The fraction of the continent owned by the player.
         """
-        c_data = list(self.continent(continent_id))
-        p_data = [t for t in c_data if t.player_id == player_id]
-        return float(len(p_data)) / len(c_data)
+        return float(self.continent_counts[player_id, continent_id]) / definitions.continent_sizes[continent_id]
 
     def num_foreign_continent_territories(self, continent_id, player_id):
         """
@@ -174,7 +274,7 @@ class Board(object):
         Returns:
             int: The number of territories on the continent owned by other players.
         """
-        return sum(1 if t.player_id != player_id else 0 for t in self.continent(continent_id))
+        return definitions.continent_sizes[continent_id] - self.continent_counts[player_id, continent_id]
 
     # ==================== #
     # == Action Methods == #
@@ -193,7 +293,7 @@ class Board(object):
         base_reinforcements = max(3, int(self.n_territories(player_id) / 3))
         bonus_reinforcements = 0
         for continent_id, bonus in definitions.continent_bonuses.items():
-            if self.continent_owner(continent_id) == player_id:
+            if self.owns_continent(player_id, continent_id):
                 bonus_reinforcements += bonus
         return base_reinforcements + bonus_reinforcements
 
@@ -207,8 +307,7 @@ class Board(object):
         Returns:
             list: List of Moves.
         """
-        return [Move(from_t.territory_id, from_t.armies, to_t.territory_id, to_t.player_id, to_t.armies)
-                for from_t in self.mobile(player_id) for to_t in self.hostile_neighbors(from_t.territory_id)]
+        return self._moves(self.attack_edges[player_id])
 
     def possible_fortifications(self, player_id):
         """
@@ -220,8 +319,33 @@ class Board(object):
         Returns:
             list: List of Moves.
         """
-        return [Move(from_t.territory_id, from_t.armies, to_t.territory_id, to_t.player_id, to_t.armies)
-                for from_t in self.mobile(player_id) for to_t in self.friendly_neighbors(from_t.territory_id)]
+        return self._moves(self.fortify_edges[player_id])
+
+    def frontier(self, player_id):
+        """
+        List the territories of a player that have at least one hostile neighbor.
+
+        Args:
+            player_id (int): ID of the player.
+
+        Returns:
+            list: Sorted list of territory IDs.
+        """
+        return sorted(self.frontiers[player_id])
+
+    def _moves(self, edges):
+        """
+        Assemble Moves from a set of edges, ordered by territory IDs.
+
+        Args:
+            edges (set): Set of (from_territory_id, to_territory_id) tuples.
+
+        Returns:
+            list: List of Moves.
+        """
+        data = self.data
+        return [Move(from_tid, data[from_tid].armies, to_tid, data[to_tid].player_id, data[to_tid].armies)
+                for from_tid, to_tid in sorted(edges)]
 
     def fortify(self, from_territory, to_territory, n_armies):
         """
@@ -239,10 +363,35 @@ class Board(object):
         if n_armies < 0 or self.armies(from_territory) <= n_armies:
             raise ValueError('Board: Cannot move {n} armies from territory {tid}.'
                              .format(n=n_armies, tid=from_territory))
-        if to_territory not in [t.territory_id for t in self.friendly_neighbors(from_territory)]:
+        if not self.is_neighbor(from_territory, to_territory) or \
+                self.owner(from_territory) != self.owner(to_territory):
             raise ValueError('Board: Cannot fortify, territories do not share owner and/or border.')
-        self.add_armies(from_territory, -n_armies)
-        self.add_armies(to_territory, +n_armies)
+        player_id = self.owner(from_territory)
+        self.commit(self.apply([
+            (from_territory, player_id, self.armies(from_territory) - n_armies),
+            (to_territory, player_id, self.armies(to_territory) + n_armies)
+        ]))
+
+    def place_armies(self, allocation, player_id=None):
+        """
+        Place new armies on multiple territories at once.
+
+        Args:
+            allocation (dict): Number of armies to place per territory_id.
+            player_id (int): If given, all territories must be owned by this player. Defaults to None.
+
+        Raises:
+            ValueError if a number of armies is negative, or a territory is not owned by the player.
+        """
+        changes = []
+        for territory_id, n_armies in allocation.items():
+            owner = self.owner(territory_id)
+            if n_armies < 0 or (player_id is not None and owner != player_id):
+                raise ValueError('Board: Cannot place {n} armies on territory {tid} for player {pid}.'
+                                 .format(n=n_armies, tid=territory_id, pid=player_id))
+            if n_armies > 0:
+                changes.append((territory_id, owner, self.armies(territory_id) + n_armies))
+        self.commit(self.apply(changes))
 
     def attack(self, from_territory, to_territory, attackers):
         """
@@ -263,19 +412,141 @@ class Board(object):
         if attackers < 1 or self.armies(from_territory) <= attackers:
             raise ValueError('Board: Cannot attack with {n} armies from territory {tid}.'
                              .format(n=attackers, tid=from_territory))
-        if to_territory not in [tid for (tid, _, _) in self.hostile_neighbors(from_territory)]:
+        if not self.is_neighbor(from_territory, to_territory) or \
+                self.owner(from_territory) == self.owner(to_territory):
             raise ValueError('Board: Cannot attack, territories do not share border or are owned by the same player.')
-        defenders = self.armies(to_territory)
+        player_id, armies = self.owner(from_territory), self.armies(from_territory)
+        defender_id, defenders = self.owner(to_territory), self.armies(to_territory)
         def_wins, att_wins = self.fight(attackers, defenders)
-        if self.armies(to_territory) == att_wins:
-            self.add_armies(from_territory, -attackers)
-            self.set_armies(to_territory, attackers - def_wins)
-            self.set_owner(to_territory, self.owner(from_territory))
-            return True
+        conquered = defenders == att_wins
+        if conquered:
+            changes = [(from_territory, player_id, armies - attackers),
+                       (to_territory, player_id, attackers - def_wins)]
+        else:
+            changes = [(from_territory, player_id, armies - def_wins),
+                       (to_territory, defender_id, defenders - att_wins)]
+        self.commit(self.apply(changes))
+        return conquered
+
+    def blitz(self, from_territory, to_territory, stop=0):
+        """
+        Perform a blitz attack: keep attacking with all armies but one until the defensive
+        territory is conquered or at most `stop` attacking armies are left. The whole battle
+        is resolved with a single random draw from the exact distribution of its final state,
+        which is statistically identical to repeated attacks.
+
+        Args:
+            from_territory (int): Territory_id of the offensive territory.
+            to_territory (int): Territory_id of the defensive territory.
+            stop (int): Stop when at most this number of attacking armies is left. Defaults to 0.
+
+        Raises:
+            ValueError if the offensive territory cannot attack.
+            ValueError if a player attacks himself or the territories do not share a border.
+
+        Returns:
+            bool: True if the defensive territory was conquered, False otherwise.
+        """
+        player_id, armies = self.owner(from_territory), self.armies(from_territory)
+        if armies < 2:
+            raise ValueError('Board: Cannot attack with {n} armies from territory {tid}.'
+                             .format(n=armies - 1, tid=from_territory))
+        if not self.is_neighbor(from_territory, to_territory) or player_id == self.owner(to_territory):
+            raise ValueError('Board: Cannot attack, territories do not share border or are owned by the same player.')
+        attackers_left, defenders_left = battle.sample_outcome(armies - 1, self.armies(to_territory), stop,
+                                                               r=self.rng.random())
+        if defenders_left == 0:
+            changes = [(from_territory, player_id, 1), (to_territory, player_id, attackers_left)]
         else:
-            self.add_armies(from_territory, -def_wins)
-            self.add_armies(to_territory, -att_wins)
-            return False
+            changes = [(from_territory, player_id, attackers_left + 1),
+                       (to_territory, self.owner(to_territory), defenders_left)]
+        self.commit(self.apply(changes))
+        return defenders_left == 0
+
+    # ===================== #
+    # == Journal Methods == #
+    # ===================== #
+
+    def snapshot(self):
+        """
+        Open a snapshot. From now on, all changes are recorded in the journal until
+        the snapshot is reverted or committed. Snapshots may be nested, but must be
+        closed in reverse order.
+
+        Returns:
+            int: Token identifying the snapshot.
+        """
+        self.open_snapshots += 1
+        return len(self.journal)
+
+    def apply(self, changes):
+        """
+        Open a snapshot and apply a set of changes.
+
+        Args:
+            changes (iterable): Iterable of tuples of the form (territory_id, player_id, armies),
+                each describing the new state of a territory.
+
+        Raises:
+            ValueError if a territory would be left with <1 armies.
+
+        Returns:
+            int: Token identifying the snapshot, to pass to revert or commit.
+        """
+        token = self.snapshot()
+        for territory_id, player_id, armies in changes:
+            if armies < 1:
+                self.revert(token)
+                raise ValueError('Board: cannot set the number of armies to <1 ({tid}, {n}).'
+                                 .format(tid=territory_id, n=armies))
+            self._update(territory_id, player_id, armies)
+        return token
+
+    def revert(self, token):
+        """
+        Undo all changes since a snapshot was opened, and close the snapshot.
+
+        Args:
+            token (int): Token of the snapshot.
+        """
+        open_snapshots, self.open_snapshots = self.open_snapshots - 1, 0
+        while len(self.journal) > token:
+            self._update(*self.journal.pop())
+        self.open_snapshots = open_snapshots
+        self._close()
+
+    def commit(self, token):
+        """
+        Keep all changes since a snapshot was opened, and close the snapshot. If the
+        snapshot is nested, the changes can still be undone by reverting an enclosing
+        snapshot.
+
+        Args:
+            token (int): Token of the snapshot.
+        """
+        self.open_snapshots -= 1
+        self._close()
+
+    def changes_since(self, version):
+        """
+        List the territories changed since a version of the board, if the change log reaches back that far.
+
+        Args:
+            version (int): Version of the board.
+
+        Returns:
+            list/None: List of tuples (territory_id, owner_changed), or None if the changes are unknown.
+        """
+        if version >= self.version:
+            return []
+        if not self.changes or self.changes[0][0] > version + 1:
+            return None
+        return [(territory_id, owner_changed) for v, territory_id, owner_changed in self.changes if v > version]
+
+    def _close(self):
+        """ Clear the journal once no snapshots are open anymore. """
+        if self.open_snapshots == 0:
+            del self.journal[:]
 
     # ====================== #
     # == Plotting Methods == #
@@ -310,8 +581,7 @@ class Board(object):
     # == Combat Methods == #
     # ==================== #    
 
-    @classmethod
-    def fight(cls, attackers, defenders):
+    def fight(self, attackers, defenders):
         """
         Stage a fight.
 
@@ -324,19 +594,19 @@ class Board(object):
         """
         n_attack_dices = min(attackers, 3)
         n_defend_dices = min(defenders, 2)
-        attack_dices = sorted([cls.throw_dice() for _ in range(n_attack_dices)], reverse=True)
-        defend_dices = sorted([cls.throw_dice() for _ in range(n_defend_dices)], reverse=True)
+        dices = self.rng.dice(n_attack_dices + n_defend_dices)
+        attack_dices = sorted(dices[:n_attack_dices], reverse=True)
+        defend_dices = sorted(dices[n_attack_dices:], reverse=True)
         wins = [att_d > def_d for att_d, def_d in zip(attack_dices, defend_dices)]
         return len([w for w in wins if w is False]), len([w for w in wins if w is True])
 
-    @staticmethod
-    def throw_dice():
+    def throw_dice(self):
         """
         Throw a dice.
         
         Returns:
             int: random int in [1, 6]. """
-        return random.randint(1, 6)
+        return self.rng.dice(1)[0]
 
     # ======================= #
     # == Territory Methods == #
@@ -374,7 +644,7 @@ class Board(object):
             territory_id (int): ID of the territory.
             player_id (int): ID of the player.
         """
-        self.data[territory_id] = Territory(territory_id, player_id, self.armies(territory_id))
+        self._update(territory_id, player_id, self.armies(territory_id))
 
     def set_armies(self, territory_id, n):
         """
@@ -389,7 +659,7 @@ class Board(object):
         """
         if n < 1:
             raise ValueError('Board: cannot set the number of armies to <1 ({tid}, {n}).'.format(tid=territory_id, n=n))
-        self.data[territory_id] = Territory(territory_id, self.owner(territory_id), n)
+        self._update(territory_id, self.owner(territory_id), n)
 
     def add_armies(self, territory_id, n):
         """
@@ -414,7 +684,20 @@ class Board(object):
         Returns:
             int: Number of armies owned by the player.
         """
-        return sum((t.armies for t in self.data if t.player_id == player_id))
+        return self.army_counts[player_id]
+
+    def n_mobile(self, player_id):
+        """
+        Count the number of territories of a player which can attack or move,
+        i.e. that have more than one army.
+
+        Args:
+            player_id (int): ID of the player.
+
+        Returns:
+            int: Number of mobile territories owned by the player.
+        """
+        return self.mobile_counts[player_id]
 
     def n_territories(self, player_id):
         """
@@ -426,7 +709,7 @@ class Board(object):
         Returns:
             int: Number of territories owned by the player.
         """
-        return len([None for t in self.data if t.player_id == player_id])
+        return self.territory_counts[player_id]
 
     def territories_of(self, player_id):
         """
@@ -452,3 +735,122 @@ class Board(object):
             generator: Generator of Territories.
         """
         return (t for t in self.data if (t.player_id == player_id and t.armies > 1))
+
+    def _update(self, territory_id, player_id, armies):
+        """
+        Replace the state of a territory, update the counters and the version, and
+        record the previous state in the journal if a snapshot is open.
+
+        Args:
+            territory_id (int): ID of the territory.
+            player_id (int): ID of the new owner.
+            armies (int): New number of armies on the territory.
+        """
+        territory = Territory(territory_id, player_id, armies)
+        previous = self.data[territory_id]
+        if self.open_snapshots:
+            self.journal.append(previous)
+        self._count(previous, -1)
+        self._index(territory_id, -1)
+        self.data[territory_id] = territory
+        self._count(territory, 1)
+        self._index(territory_id, 1)
+        self.version += 1
+        self.changes.append((self.version, territory_id, previous.player_id != player_id))
+
+    def _count(self, territory, sign):
+        """
+        Add (sign=1) or remove (sign=-1) a territory to/from the counters and the hash.
+
+        Args:
+            territory (Territory): The territory.
+            sign (int): 1 to add the territory, -1 to remove it.
+        """
+        tid, pid, armies = territory
+        self.territory_counts[pid] += sign
+        self.army_counts[pid] += sign * armies
+        self.mobile_counts[pid] += sign * (armies > 1)
+        self.continent_counts[pid, definitions.territory_continents[tid]] += sign
+        self.state_hash ^= zobrist_key(territory)
+
+    def _index_all(self):
+        """
+        Build the frontiers and the attack and fortification edges from scratch.
+        """
+        self.hostile_counts, self.frontiers, self.attack_edges, self.fortify_edges = self._build_index()
+
+    def _build_index(self):
+        """
+        Compute the hostile neighbor counts, frontiers, attack edges and fortification edges from the state
+        of the board, without touching the maintained ones.
+
+        Returns:
+            tuple: Hostile neighbor count per territory, and the frontiers, attack edges and fortification
+                edges per player.
+        """
+        hostile_counts = [0] * 42
+        frontiers = defaultdict(set)
+        attack_edges = defaultdict(set)
+        fortify_edges = defaultdict(set)
+        for tid in range(42):
+            player_id, armies = self.owner(tid), self.armies(tid)
+            for nid in definitions.territory_neighbor_ids[tid]:
+                hostile = self.owner(nid) != player_id
+                hostile_counts[tid] += hostile
+                if armies > 1:
+                    (attack_edges if hostile else fortify_edges)[player_id].add((tid, nid))
+            if hostile_counts[tid]:
+                frontiers[player_id].add(tid)
+        return hostile_counts, frontiers, attack_edges, fortify_edges
+
+    def _index(self, territory_id, sign):
+        """
+        Add (sign=1) or remove (sign=-1) the edges to and from a territory, and update the
+        frontiers of the territory and its neighbors accordingly.
+
+        Args:
+            territory_id (int): ID of the territory.
+            sign (int): 1 to add the edges, -1 to remove them.
+        """
+        owner, hostile_counts = self.owner, self.hostile_counts
+        player_id, armies = owner(territory_id), self.armies(territory_id)
+        neighbor_ids = definitions.territory_neighbor_ids[territory_id]
+        for nid in neighbor_ids:
+            other_id, other_armies = owner(nid), self.armies(nid)
+            hostile = other_id != player_id
+            if hostile:
+                hostile_counts[territory_id] += sign
+                hostile_counts[nid] += sign
+            edges = self.attack_edges if hostile else self.fortify_edges
+            if sign > 0:
+                if armies > 1:
+                    edges[player_id].add((territory_id, nid))
+                if other_armies > 1:
+                    edges[other_id].add((nid, territory_id))
+            else:
+                if armies > 1:
+                    edges[player_id].discard((territory_id, nid))
+                if other_armies > 1:
+                    edges[other_id].discard((nid, territory_id))
+        for tid in (territory_id,) + neighbor_ids:
+            if hostile_counts[tid]:
+                self.frontiers[owner(tid)].add(tid)
+            else:
+                self.frontiers[owner(tid)].discard(tid)
+
+    def check_consistency(self):
+        """
+        Check the incrementally maintained frontiers and edges against a rebuild from scratch. The maintained
+        state is left as is.
+
+        Raises:
+            ValueError if the frontiers or edges are inconsistent with the state of the board.
+        """
+        maintained = (self.hostile_counts, self.frontiers, self.attack_edges, self.fortify_edges)
+        rebuilt = self._build_index()
+        for name, old, new in zip(('hostile counts', 'frontiers', 'attack edges', 'fortification edges'),
+                                  maintained, rebuilt):
+            if isinstance(new, dict):
+                old, new = ({k: v for k, v in d.items() if v} for d in (old, new))
+            if old != new:
+                raise ValueError('Board: inconsistent {name}: {old} != {new}'.format(name=name, old=old, new=new))
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    The LRUCache is a bounded key-value store. When it is full, the least
+    recently used entry is evicted to make room for a new one. It is meant
+    to store per-state values keyed on the Board's state hash, such that
+    positions which occur repeatedly are only evaluated once.
+
+    Args:
+        maxsize (int): Maximum number of entries. Defaults to 10000.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return '{cls}({n}/{maxsize})'.format(cls=self.__class__.__name__, n=len(self), maxsize=self.maxsize)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        """
+        Look up a value and mark it as most recently used.
+
+        Args:
+            key (hashable): The key.
+            default: Value to return if the key is unknown. Defaults to None.
+
+        Returns:
+            The stored value, or the default.
+        """
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries[key] = value
+        return value
+
+    def put(self, key, value):
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (hashable): The key.
+            value: The value.
+        """
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def lookup(self, key, compute):
+        """
+        Look up a value, computing and storing it if it is unknown.
+
+        Args:
+            key (hashable): The key.
+            compute (callable): Function without arguments that computes the value.
+
+        Returns:
+            The stored or computed value.
+        """
+        try:
+            value = self.entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            value = compute()
+        else:
+            self.hits += 1
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        """ Remove all entries. """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -1,4 +1,4 @@
-import random
+from randomsource import RandomSource
 
 
 class Cards(object):
@@ -20,6 +20,7 @@ class Cards(object):
         n_inf (int): Number of infantry cards. Defaults to 0.
         n_cav (int): Number of cavalry cards. Defaults to 0.
         n_art (int): Number of artillery cards. Defaults to 0.
+        rng (RandomSource): Source of random cards. Defaults to a new RandomSource.
     """
 
     card_sets = {
@@ -29,8 +30,9 @@ class Cards(object):
         'mix': ((1, 1, 1), 10)
     }
 
-    def __init__(self, n_inf=0, n_cav=0, n_art=0):
+    def __init__(self, n_inf=0, n_cav=0, n_art=0, rng=None):
         self.cards = [n_inf, n_cav, n_art]
+        self.rng = rng or RandomSource()
 
     def __repr__(self):
         return '{cls}{cards}'.format(cls=self.__class__.__name__, cards=tuple(self.cards))
@@ -79,7 +81,7 @@ class Cards(object):
         Returns:
             None
         """
-        card_type = random.randint(0, 2)
+        card_type = self.rng.randint(0, 2)
         self.cards[card_type] += 1
 
     def turn_in(self, set_name):
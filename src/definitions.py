@@ -132,6 +132,14 @@ territory_locations = {
     40: [280, 400],
     41: [1390, 135]}
 
+territory_neighbor_ids = tuple(
+    tuple(sorted(territory_neighbors[tid])) for tid in range(len(territory_neighbors))
+)
+
+territory_neighbor_masks = tuple(
+    sum(1 << nid for nid in neighbor_ids) for neighbor_ids in territory_neighbor_ids
+)
+
 territory_neighbors_df = pd.DataFrame(
     [(territory, neighbor) for territory, neighbors in territory_neighbors.items() for neighbor in neighbors],
     columns=['territory_id', 'neighbor_id']
@@ -155,6 +163,10 @@ continent_territories = {
     4: [9, 16, 23, 38],
     5: [3, 4, 28, 37]}
 
+continent_sizes = {cid: len(tids) for cid, tids in continent_territories.items()}
+
+continent_masks = {cid: sum(1 << tid for tid in tids) for cid, tids in continent_territories.items()}
+
 territory_continents = {
     tid: cid for cid, tids in continent_territories.items() for tid in tids
     }
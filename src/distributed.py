@@ -0,0 +1,406 @@
+import argparse
+import importlib
+import itertools
+import json
+import socket
+import SocketServer
+import threading
+import time
+from collections import Counter, deque
+
+from ranker import play_seats
+
+
+def encode_seat(seat):
+    """
+    Encode a seat (see ranker.seat) as JSON-compatible data.
+
+    Args:
+        seat (tuple): Player class and gene values (None if the player has no genome).
+
+    Returns:
+        list: Dotted path of the player class, and the gene values as a list of floats (or None).
+    """
+    player_cls, values = seat
+    path = '{module}.{name}'.format(module=player_cls.__module__, name=player_cls.__name__)
+    return [path, None if values is None else [float(v) for v in values]]
+
+
+def decode_seat(data):
+    """
+    Decode a seat encoded by encode_seat, importing the player class.
+
+    Args:
+        data (list): Dotted path of the player class, and the gene values (or None).
+
+    Returns:
+        tuple: Player class and gene values.
+    """
+    path, values = data
+    module, _, name = path.rpartition('.')
+    return getattr(importlib.import_module(module), name), values
+
+
+def send(wfile, message):
+    """
+    Send a single message as a line of JSON.
+
+    Args:
+        wfile (file): File object of the socket.
+        message (dict): The message.
+    """
+    wfile.write(json.dumps(message, separators=(',', ':')) + '\n')
+    wfile.flush()
+
+
+class JobError(Exception):
+    """ Raised by Coordinator.map when a game failed on every attempt. """
+
+
+class Coordinator(object):
+    """
+    The Coordinator hands out games to Workers over TCP, such that the games of a RiskRanker iteration can
+    be played by processes on other machines. Pass it to a RiskRanker (or PlayerPool) as coordinator, and
+    start any number of workers with:
+
+        python distributed.py HOST PORT
+
+    The protocol is newline-delimited JSON. A worker asks for a batch of jobs, and returns the results of
+    its previous batch in the same message, together with the jobs it failed to play:
+
+        {"n": 4, "results": [[job_id, winner], ...], "errors": [[job_id, message], ...]}
+
+    The coordinator answers with {"type": "jobs", "jobs": [...]}, where a job holds the id, the seats (class
+    path and genes of every player), max_turns and seed of a game, with {"type": "wait"} if there is nothing
+    to do, or with {"type": "stop"} once it is closed.
+
+    Workers pull jobs, so fast workers play more games. Once the queue is empty, an idle worker steals the
+    oldest running job of another worker and plays it as well; the first result wins, which is the same
+    result since games are seeded. Jobs of a worker that disconnects, or that did not report back within
+    the timeout, are queued again. A job that failed on a worker, or whose worker disconnected, counts as a
+    failed attempt; after max_attempts failed attempts, map raises a JobError instead of waiting forever.
+
+    Args:
+        host (str): Host to listen on. Defaults to 'localhost'.
+        port (int): Port to listen on. Defaults to 0, which picks a free port.
+        timeout (float): Seconds after which an unfinished job is handed out again. Defaults to 600.
+        poll (float): Seconds a request for jobs waits for new jobs before answering wait. Defaults to 1.
+        max_attempts (int): Number of failed attempts after which a job is given up. Defaults to 3.
+    """
+
+    def __init__(self, host='localhost', port=0, timeout=600., poll=1., max_attempts=3):
+        self.timeout = timeout
+        self.poll = poll
+        self.max_attempts = max_attempts
+        self.condition = threading.Condition()
+        self.jobs = {}
+        self.pending = deque()
+        self.assigned = {}
+        self.results = {}
+        self.attempts = Counter()
+        self.failures = {}
+        self.job_ids = itertools.count()
+        self.stopped = False
+        self.server = _Server((host, port), _Handler)
+        self.server.coordinator = self
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __repr__(self):
+        return '{cls}({host}:{port})'.format(cls=self.__class__.__name__, host=self.address[0], port=self.address[1])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def address(self):
+        """
+        Address the coordinator listens on.
+
+        Returns:
+            tuple: Tuple (host, port).
+        """
+        return self.server.server_address
+
+    def map(self, seats, max_turns, seeds):
+        """
+        Queue a set of games, and stream their winners.
+
+        Args:
+            seats (list): List of games, each represented by a list of seats, see ranker.seat.
+            max_turns (int): Maximum number of turns per game.
+            seeds (list): Seed of every game.
+
+        Returns:
+            generator: Winner of every game (see ranker.play), in the order of the games. A winner is
+                yielded as soon as it and the winners of all previous games are known. Raises a JobError
+                once a game has failed max_attempts times.
+        """
+        with self.condition:
+            job_ids = []
+            for game_seats, seed in zip(seats, seeds):
+                job_id = next(self.job_ids)
+                self.jobs[job_id] = {'id': job_id, 'seats': [encode_seat(s) for s in game_seats],
+                                     'max_turns': max_turns, 'seed': seed}
+                self.pending.append(job_id)
+                job_ids.append(job_id)
+            self.condition.notify_all()
+        return self.stream(job_ids)
+
+    def stream(self, job_ids):
+        """
+        Wait for the results of jobs.
+
+        Args:
+            job_ids (list): List of job ids.
+
+        Returns:
+            generator: Result of every job, in the given order.
+        """
+        for i, job_id in enumerate(job_ids):
+            with self.condition:
+                while job_id not in self.results and job_id not in self.failures:
+                    self.condition.wait(self.poll)
+                if job_id in self.failures:
+                    message = self.failures.pop(job_id)
+                    self.cancel(job_ids[i + 1:])
+                    raise JobError('Game {job_id} failed {n} times, last with: {message}'.format(
+                        job_id=job_id, n=self.max_attempts, message=message))
+                winner = self.results.pop(job_id)
+            yield winner
+
+    def cancel(self, job_ids):
+        """
+        Forget jobs, whether they are queued, running or done.
+
+        Args:
+            job_ids (list): List of job ids.
+        """
+        with self.condition:
+            for job_id in job_ids:
+                for jobs in (self.jobs, self.assigned, self.results, self.attempts, self.failures):
+                    jobs.pop(job_id, None)
+
+    def assign(self, worker, n):
+        """
+        Hand out jobs to a worker. Waits up to poll seconds if there is nothing to hand out.
+
+        Args:
+            worker (hashable): Key of the worker.
+            n (int): Maximum number of jobs.
+
+        Returns:
+            list/None: List of jobs, None if the coordinator is closed.
+        """
+        with self.condition:
+            deadline = time.time() + self.poll
+            while True:
+                if self.stopped:
+                    return None
+                now = time.time()
+                self.requeue(now)
+                job_ids = []
+                while self.pending and len(job_ids) < n:
+                    job_id = self.pending.popleft()
+                    if job_id in self.jobs:
+                        job_ids.append(job_id)
+                job_ids = job_ids or self.steal(worker, n)
+                if job_ids or now >= deadline:
+                    break
+                self.condition.wait(deadline - now)
+            for job_id in job_ids:
+                self.assigned.setdefault(job_id, {})[worker] = now
+            return [self.jobs[job_id] for job_id in job_ids]
+
+    def steal(self, worker, n):
+        """
+        Select the oldest running jobs of other workers, which are not already shared.
+
+        Args:
+            worker (hashable): Key of the stealing worker.
+            n (int): Maximum number of jobs.
+
+        Returns:
+            list: List of job ids.
+        """
+        running = [(min(holders.values()), job_id) for job_id, holders in self.assigned.items()
+                   if len(holders) == 1 and worker not in holders]
+        return [job_id for _, job_id in sorted(running)[:n]]
+
+    def requeue(self, now):
+        """
+        Queue the jobs again that no worker reported back on within the timeout.
+
+        Args:
+            now (float): Current time.
+        """
+        for job_id, holders in self.assigned.items():
+            if now - max(holders.values()) > self.timeout:
+                del self.assigned[job_id]
+                self.pending.appendleft(job_id)
+
+    def complete(self, results, errors=tuple(), worker=None):
+        """
+        Store the results of a worker. Results of jobs that are already done are ignored. A failed job is
+        queued again, unless another worker is playing it as well, see fail.
+
+        Args:
+            results (list): List of tuples (job id, winner).
+            errors (list): List of tuples (job id, error message). Defaults to an empty tuple.
+            worker (hashable): Key of the worker. Defaults to None.
+        """
+        with self.condition:
+            for job_id, winner in results:
+                self.assigned.pop(job_id, None)
+                self.attempts.pop(job_id, None)
+                if self.jobs.pop(job_id, None) is not None:
+                    self.results[job_id] = winner
+            for job_id, message in errors:
+                holders = self.assigned.get(job_id)
+                if holders is not None and holders.pop(worker, None) is not None and not holders:
+                    del self.assigned[job_id]
+                    self.fail(job_id, message)
+            self.condition.notify_all()
+
+    def fail(self, job_id, message):
+        """
+        Count a failed attempt of a job, and queue it again. After max_attempts failed attempts, the job is
+        given up and its stream raises a JobError.
+
+        Args:
+            job_id (int): Id of the job.
+            message (str): Description of the failure.
+        """
+        if job_id not in self.jobs:
+            return
+        self.attempts[job_id] += 1
+        if self.attempts[job_id] >= self.max_attempts:
+            del self.jobs[job_id]
+            del self.attempts[job_id]
+            self.failures[job_id] = message
+        else:
+            self.pending.appendleft(job_id)
+
+    def release(self, worker):
+        """
+        Queue the jobs of a disconnected worker again, unless another worker is playing them as well. This
+        counts as a failed attempt, see fail.
+
+        Args:
+            worker (hashable): Key of the worker.
+        """
+        with self.condition:
+            for job_id, holders in self.assigned.items():
+                if holders.pop(worker, None) is not None and not holders:
+                    del self.assigned[job_id]
+                    self.fail(job_id, 'worker disconnected')
+            self.condition.notify_all()
+
+    def close(self):
+        """
+        Stop the coordinator. Workers are told to stop on their next request.
+        """
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _Server(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(SocketServer.StreamRequestHandler):
+    """ Serve a single worker connection, see Coordinator. """
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        try:
+            for line in iter(self.rfile.readline, ''):
+                message = json.loads(line)
+                coordinator.complete(message.get('results', []), message.get('errors', []), self.client_address)
+                jobs = coordinator.assign(self.client_address, message['n'])
+                if jobs is None:
+                    send(self.wfile, {'type': 'stop'})
+                    break
+                send(self.wfile, {'type': 'jobs', 'jobs': jobs} if jobs else {'type': 'wait'})
+        except socket.error:
+            pass
+        finally:
+            coordinator.release(self.client_address)
+
+
+class Worker(object):
+    """
+    The Worker plays the games handed out by a Coordinator, until the coordinator stops or goes away.
+
+    Args:
+        host (str): Host of the coordinator.
+        port (int): Port of the coordinator.
+        batch_size (int): Number of jobs to ask for at once. Defaults to 4.
+    """
+
+    def __init__(self, host, port, batch_size=4):
+        self.address = (host, port)
+        self.batch_size = batch_size
+
+    def run(self):
+        """
+        Connect to the coordinator and play games. A game that raises is reported back as an error, see
+        Coordinator.
+
+        Returns:
+            int: Number of games played.
+        """
+        sock = socket.create_connection(self.address)
+        rfile, wfile = sock.makefile('r'), sock.makefile('w')
+        n_games, results, errors = 0, [], []
+        try:
+            while True:
+                send(wfile, {'n': self.batch_size, 'results': results, 'errors': errors})
+                line = rfile.readline()
+                if not line:
+                    break
+                reply = json.loads(line)
+                if reply['type'] == 'stop':
+                    break
+                results, errors = [], []
+                for job in reply.get('jobs', []):
+                    try:
+                        results.append([job['id'], self.play(job)])
+                    except Exception as e:
+                        errors.append([job['id'], '{name}: {e}'.format(name=e.__class__.__name__, e=e)])
+                n_games += len(results)
+        except socket.error:
+            pass
+        finally:
+            sock.close()
+        return n_games
+
+    @staticmethod
+    def play(job):
+        """
+        Play the game of a job.
+
+        Args:
+            job (dict): The job, see Coordinator.
+
+        Returns:
+            int/None: Index of the winning player, or None if there is no winner.
+        """
+        return play_seats([decode_seat(s) for s in job['seats']], job['max_turns'], job['seed'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Play the games of a Coordinator.')
+    parser.add_argument('host', help='host of the coordinator')
+    parser.add_argument('port', type=int, help='port of the coordinator')
+    parser.add_argument('--batch-size', type=int, default=4, help='number of jobs to ask for at once')
+    args = parser.parse_args()
+    Worker(args.host, args.port, batch_size=args.batch_size).run()
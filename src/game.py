@@ -1,5 +1,3 @@
-import random
-
 import matplotlib.pyplot as plt
 from matplotlib.font_manager import FontProperties
 
@@ -7,6 +5,8 @@ import definitions
 from board import Board
 from cards import Cards
 from missions import missions as get_missions
+from player import AttackPlan
+from randomsource import RandomSource
 
 
 class Game(object):
@@ -43,73 +43,116 @@ class Game(object):
             self.missions[pid].assign_to(pid)
 
     @classmethod
-    def create(cls, players):
+    def create(cls, players, board_cls=Board, seed=None):
         """
         Create a new Game.
         
         Args:
             players (list): List of Players.
+            board_cls (class): The Board backend to play on. Defaults to Board.
+            seed (int): Seed of the random numbers of the game. Defaults to None.
                 
         Returns:
             Game: newly initialized Game object.
         """
         n_players = len(players)
+        rng = RandomSource(seed)
         return cls(
-            board=Board.create(n_players),
-            cards=cls.assign_cards(n_players),
-            missions=cls.assign_missions(n_players),
+            board=board_cls.create(n_players, rng=rng),
+            cards=cls.assign_cards(n_players, rng=rng),
+            missions=cls.assign_missions(n_players, rng=rng),
             players=players,
             turn=-1
         )
 
     @staticmethod
-    def assign_cards(n_players):
+    def assign_cards(n_players, rng=None):
         """
         Assign reinforcement card hands to players.
 
         Args:
             n_players (int): Number of players to assign cards to.
+            rng (RandomSource): Source of random cards. Defaults to a new RandomSource.
 
         Returns:
             list: List of Cards objects, one for each player.
         """
-        return [Cards() for _ in range(n_players)]
+        rng = rng or RandomSource()
+        return [Cards(rng=rng) for _ in range(n_players)]
 
     @staticmethod
-    def assign_missions(n_players):
+    def assign_missions(n_players, rng=None):
         """
         Randomly assign missions to players.
 
         Args:
             n_players (int): Number of players to assign missions to.
+            rng (RandomSource): Source of random numbers. Defaults to a new RandomSource.
 
         Returns:
             list: List of missions, one for each player.
         """
         available_missions = get_missions(n_players)
-        random.shuffle(available_missions)
+        (rng or RandomSource()).shuffle(available_missions)
         return available_missions[:n_players]
 
-    def initialize_armies(self):
-        """
-        Have all players place all starting armies on the board.
+    def initialize_armies(self, mode='batched'):
         """
-        while self.initialize_single_army():
-            continue
+        Have all players place all starting armies on the board. The placement can be done in three modes:
+          - 'interleaved': the players take turns placing a single army.
+          - 'batched': the players take turns placing all their remaining armies at once, see reinforce_many.
+          - 'parallel': all players decide on the placement of their remaining armies on the same board,
+            after which all armies are placed at once.
+
+        Args:
+            mode (str): The placement mode. Defaults to 'batched'.
+
+        Raises:
+            ValueError if the mode is unknown.
+        """
+        remaining = self.remaining_armies()
+        if mode == 'interleaved':
+            while self.initialize_single_army(remaining):
+                continue
+        elif mode == 'batched':
+            for player in self.players:
+                self.place_reinforcements(player, remaining[player.player_id])
+        elif mode == 'parallel':
+            allocations = [(player, player.reinforce_many(remaining[player.player_id])) for player in self.players]
+            for player, allocation in allocations:
+                self.board.place_armies(allocation, player.player_id)
+        else:
+            raise ValueError('Game: unknown placement mode {mode}.'.format(mode=mode))
         self.next_turn()
 
-    def initialize_single_army(self):
+    def remaining_armies(self):
+        """
+        Count the starting armies each player has yet to place.
+
+        Returns:
+            dict: Number of remaining starting armies per player ID.
+        """
+        return {player.player_id: max(self.starting_armies - self.board.n_armies(player.player_id), 0)
+                for player in self.players}
+
+    def initialize_single_army(self, remaining=None):
         """
         Have each player place one army on the board, if they have one left.
+
+        Args:
+            remaining (dict): Number of remaining starting armies per player ID, which is updated
+                in place. Defaults to the counts of remaining_armies.
         
         Returns:
             bool, True if at least one player has placed a new army. False if all armies have been placed.
         """
+        remaining = self.remaining_armies() if remaining is None else remaining
         changed = False
         for player in self.players:
-            if self.board.n_armies(player.player_id) < self.starting_armies:
+            if remaining[player.player_id] > 0:
                 territory_id = player.reinforce()
                 self.board.add_armies(territory_id, 1)
+                remaining[player.player_id] -= 1
                 changed = True
         return changed
 
@@ -243,29 +286,43 @@ class Game(object):
         Handle the reinforcement phase of a player.
         The reinforcement stage consists of two parts:
           - In the first part the player receives a number of reinforcements,
-            based on the territories he owns. He places them on the board one-
-            by-one.
+            based on the territories he owns. He places them on the board at
+            once.
           - In the second part the player may return in reinforcement cards,
             after which he receives more reinforcements which he places on the
-            board one-by-one.
+            board at once.
         
         Args:
             player (Player): player who may reinforce.
         """
-        n_reinforcements = self.board.reinforcements(player.player_id)
-        for _ in range(n_reinforcements):
-            self.board.add_armies(player.reinforce(), 1)
+        self.place_reinforcements(player, self.board.reinforcements(player.player_id))
         card_set = player.turn_in_cards()
         if card_set is None:
             return
-        n_extra = self.cards[player.player_id].turn_in(card_set)
-        for _ in range(n_extra):
-            self.board.add_armies(player.reinforce(), 1)
+        self.place_reinforcements(player, self.cards[player.player_id].turn_in(card_set))
+
+    def place_reinforcements(self, player, n):
+        """
+        Have a player place a number of armies on the board.
+
+        Args:
+            player (Player): player who places the armies.
+            n (int): number of armies to place.
+
+        Raises:
+            ValueError if the player does not place exactly n armies on his own territories.
+        """
+        allocation = player.reinforce_many(n)
+        if sum(allocation.values()) != n:
+            raise ValueError('Game: player {pid} placed {m} instead of {n} armies.'
+                             .format(pid=player.player_id, m=sum(allocation.values()), n=n))
+        self.board.place_armies(allocation, player.player_id)
 
     def attack(self, player):
         """
         Handle the attack phase of a player.
-        The player may perform as many attacks as he wishes.
+        The player may perform as many attacks as he wishes. An attack
+        can be a single dice roll, or an AttackPlan.
         
         Args:
             player (Player): player that may attack.
@@ -277,11 +334,38 @@ class Game(object):
                 break
             if not self.current_player_id == self.board.owner(attack[0]):
                 raise Exception('Invalid attack!')
-            if self.board.attack(*attack):
+            if isinstance(attack, AttackPlan):
+                conquered = self.execute_plan(attack)
+            else:
+                conquered = self.board.attack(*attack)
+            if conquered:
                 did_win = True
         if did_win:
             self.cards[player.player_id].receive()
 
+    def execute_plan(self, plan):
+        """
+        Execute an attack plan roll-by-roll, attacking with all armies but one.
+
+        Args:
+            plan (AttackPlan): The attack plan.
+
+        Returns:
+            bool: True if the defensive territory was conquered, False otherwise.
+        """
+        from_tid, to_tid = plan.from_territory_id, plan.to_territory_id
+        initial = attackers = self.board.armies(from_tid) - 1
+        while True:
+            if self.board.attack(from_tid, to_tid, attackers):
+                return True
+            attackers, defenders = self.board.armies(from_tid) - 1, self.board.armies(to_tid)
+            if attackers < 1 or attackers < plan.min_ratio * defenders:
+                return False
+            if plan.max_losses is not None and initial - attackers >= plan.max_losses:
+                return False
+            if plan.condition is not None and not plan.condition(attackers, defenders):
+                return False
+
     def fortify(self, player):
         """
         Handle the fortification phase of a player.
@@ -1,14 +1,32 @@
+from collections import Counter
+
+import numpy as np
+
+import battle
 from missions import TerritoryMission
 from genome import Gene, ListGene, Genome
-from player import SmartPlayer
+from player import AttackPlan, SmartPlayer
+
+F = {name: i for i, name in enumerate(SmartPlayer.feature_names)}
 
 
 class GeneticPlayer(Genome, SmartPlayer):
     """
     The GeneticPlayer decides which moves to make based on weights given to each move.
 
-
+    If plan_attacks is True, the player commits to an attack as an AttackPlan: the Game keeps
+    rolling as long as the ratio of attacking to defending armies keeps the weight of that attack
+    above the cutoff, see plan_ratio, instead of asking the player to re-score all possible attacks
+    after every roll. Defaults to False.
     """
+    plan_attacks = False
+
+    # Weights of the columns of the feature matrices of attacks, fortifications and reinforcements
+    attack_weight_names = ('att_bonus_wgt', 'att_chance_wgt', 'att_conqc_wgt', 'att_mission_wgt', 'att_narmies_wgt')
+    fortification_weight_names = ('ft_avantage_wgt', 'ft_tvantage_wgt', 'ft_mission_wgt', 'ft_bonus_wgt',
+                                  'ft_narmies_wgt')
+    reinforce_weight_names = ('re_dbonus_wgt', 're_ibonus_wgt', 're_mission_wgt', 're_avantage_wgt', 're_tvantage_wgt')
+
     specifications = (
         # Turning in cards
         ListGene('turn_in_cutoff', values=[4, 6, 8, 10], volatility=0.01),
@@ -70,14 +88,20 @@ class GeneticPlayer(Genome, SmartPlayer):
             won_yet (bool): True if player has won a territory yet in this turn.
 
         Returns:
-            tuple/None: Tuple of the form (from_territory_id, to_territory_id, num_armies).
+            tuple/AttackPlan/None: Tuple of the form (from_territory_id, to_territory_id, num_armies),
+                or an AttackPlan if plan_attacks is True.
         """
         possible_attacks = self.attacks
         if len(possible_attacks) == 0:
             return None
-        attack = max(possible_attacks, key=lambda x: self.attack_weight(x))
-        if self.attack_weight(attack) < self.min_attack_weight(won_yet):
+        weights = self.attack_weights(possible_attacks)
+        best = np.argmax(weights)
+        attack, min_weight = possible_attacks[best], self.min_attack_weight(won_yet)
+        if weights[best] < min_weight:
             return None
+        if self.plan_attacks:
+            return AttackPlan(attack.from_territory_id, attack.to_territory_id,
+                              min_ratio=self.plan_ratio(attack, min_weight))
         return attack.from_territory_id, attack.to_territory_id, attack.from_armies - 1
 
     def attack_weight(self, attack):
@@ -90,14 +114,99 @@ class GeneticPlayer(Genome, SmartPlayer):
         Returns:
             float: The weight of the attack.
         """
+        return self.target_weight(attack.to_territory_id) + self.battle_weight(attack)
+
+    def plan_ratio(self, attack, min_weight):
+        """
+        Calculate the minimum ratio of attacking to defending armies of an AttackPlan for an attack. The weights
+        of all battle states the attack can reach are looked up in the battle table at once; the ratio is the
+        lowest one at which the plan only continues in states where the attack weight is at least min_weight.
+
+        Args:
+            attack (Move): The attack.
+            min_weight (float): The minimum attack weight.
+
+        Returns:
+            float: The minimum ratio of attacking to defending armies.
+        """
+        attackers = np.arange(1, attack.from_armies)[:, None]
+        defenders = np.arange(1, attack.to_armies + 1)[None, :]
+        weights = (self.target_weight(attack.to_territory_id) +
+                   battle.chance_ratios[np.minimum(defenders - 1, 1), np.minimum(attackers - 1, 2)] *
+                   self['att_chance_wgt'] +
+                   battle.table().win_probability(attackers, defenders) * self['att_conqc_wgt'] +
+                   attackers * self['att_narmies_wgt'])
+        failing = weights < min_weight
+        # Highest failing number of attackers per number of defenders (0 if none fails)
+        highest = np.where(failing.any(axis=0), len(failing) - np.argmax(failing[::-1], axis=0), 0)
+        ratios = (highest + 1.) / defenders[0]
+        return float(ratios[highest > 0].max()) if highest.any() else 0.
+
+    def target_weight(self, territory_id):
+        """
+        Calculate the part of the attack weight that depends on the attacked territory only. It
+        does not change while the territory is being attacked.
+
+        Args:
+            territory_id (int): ID of the attacked territory.
+
+        Returns:
+            float: The weight of the target.
+        """
+        features = self.features[territory_id]
+        return (features[F['direct_bonus']] * self['att_bonus_wgt'] +
+                features[F['mission_value']] * self['att_mission_wgt'])
+
+    def battle_weight(self, attack):
+        """
+        Calculate the part of the attack weight that depends on the armies in the battle.
+
+        Args:
+            attack (Move): The attack.
+
+        Returns:
+            float: The weight of the battle.
+        """
         return sum((
-            self.direct_bonus(attack.to_territory_id) * self['att_bonus_wgt'],
             self.chance_ratio(attack) * self['att_chance_wgt'],
             self.conquering_chance(attack) * self['att_conqc_wgt'],
-            self.mission_value(attack.to_territory_id) * self['att_mission_wgt'],
             (attack.from_armies - 1) * self['att_narmies_wgt'],
         ))
 
+    def attack_matrix(self, attacks):
+        """
+        Assemble the features of a list of attacks into a matrix, with one row per attack
+        and one column per weight in attack_weight_names.
+
+        Args:
+            attacks (list): List of Moves.
+
+        Returns:
+            np.ndarray: Feature matrix of shape (len(attacks), len(attack_weight_names)).
+        """
+        from_armies, to_territories, to_armies = np.array(
+            [(a.from_armies, a.to_territory_id, a.to_armies) for a in attacks]).T
+        features = self.features[to_territories]
+        return np.column_stack((
+            features[:, F['direct_bonus']],
+            battle.chance_ratios[np.minimum(to_armies - 1, 1), np.minimum(from_armies - 2, 2)],
+            battle.table().win_probability(from_armies - 1, to_armies),
+            features[:, F['mission_value']],
+            from_armies - 1
+        ))
+
+    def attack_weights(self, attacks):
+        """
+        Calculate the attack weights for a list of attacks at once.
+
+        Args:
+            attacks (list): List of Moves.
+
+        Returns:
+            np.ndarray: The weights of the attacks.
+        """
+        return self.attack_matrix(attacks).dot(self.vector(self.attack_weight_names))
+
     def min_attack_weight(self, won_yet):
         """
         Calculate the minimum attack weight an attack needs before we attack.
@@ -120,22 +229,56 @@ class GeneticPlayer(Genome, SmartPlayer):
         possible_fortifications = self.fortifications
         if len(possible_fortifications) == 0:
             return None
-        fortification = max(possible_fortifications, key=lambda x: self.fortification_weight(x))
-        if self.fortification_weight(fortification) < self['ft_min_wgt']:
+        weights = self.fortification_weights(possible_fortifications)
+        best = np.argmax(weights)
+        if weights[best] < self['ft_min_wgt']:
             return None
+        fortification = possible_fortifications[best]
         return fortification.from_territory_id, fortification.to_territory_id, fortification.from_armies - 1
 
     def fortification_weight(self, fortification):
-        return sum((
-            (self.army_vantage_difference(fortification)) * self['ft_avantage_wgt'],
-            (self.territory_vantage_difference(fortification)) * self['ft_tvantage_wgt'],
-            (self.mission_value(fortification.from_territory_id)
-             - self.mission_value(fortification.to_territory_id)) * self['ft_mission_wgt'],
-            (self.direct_bonus(fortification.from_territory_id)
-             - self.direct_bonus(fortification.to_territory_id)) * self['ft_bonus_wgt'],
-            (fortification.from_armies - 1) * self['ft_narmies_wgt']
+        """
+        Calculate the fortification weight of a fortification.
+
+        Args:
+            fortification (Move): The fortification.
+
+        Returns:
+            float: The weight of the fortification.
+        """
+        return float(self.fortification_weights([fortification])[0])
+
+    def fortification_matrix(self, fortifications):
+        """
+        Assemble the features of a list of fortifications into a matrix, with one row per
+        fortification and one column per weight in fortification_weight_names.
+
+        Args:
+            fortifications (list): List of Moves.
+
+        Returns:
+            np.ndarray: Feature matrix of shape (len(fortifications), len(fortification_weight_names)).
+        """
+        from_territories, from_armies, to_territories = np.array(
+            [(f.from_territory_id, f.from_armies, f.to_territory_id) for f in fortifications]).T
+        differences = self.features[from_territories] - self.features[to_territories]
+        return np.column_stack((
+            differences[:, [F['army_vantage'], F['territory_vantage'], F['mission_value'], F['direct_bonus']]],
+            from_armies - 1
         ))
 
+    def fortification_weights(self, fortifications):
+        """
+        Calculate the fortification weights for a list of fortifications at once.
+
+        Args:
+            fortifications (list): List of Moves.
+
+        Returns:
+            np.ndarray: The weights of the fortifications.
+        """
+        return self.fortification_matrix(fortifications).dot(self.vector(self.fortification_weight_names))
+
     def reinforce(self):
         """
         Decide where to place an army.
@@ -143,18 +286,61 @@ class GeneticPlayer(Genome, SmartPlayer):
         Returns:
             int: Territory ID.
         """
-        options = self.territories
-        if isinstance(self.mission, TerritoryMission) and len(options) >= 18:
-            options = [o for o in options if self.board.armies(o) < 2]
-            if len(options) == 0:  # in this case the player has in principle won, and only needs to finish his turn
-                options = self.territories
-        return max(options, key=lambda tid: self.reinforce_weight(tid))
+        territories = self.territories
+        weights = self.reinforce_weights(territories)
+        if isinstance(self.mission, TerritoryMission) and len(territories) >= 18:
+            options = np.flatnonzero([self.board.armies(tid) < 2 for tid in territories])
+            if len(options) > 0:  # otherwise the player has in principle won, and only needs to finish his turn
+                return territories[options[np.argmax(weights[options])]]
+        return territories[np.argmax(weights)]
+
+    def reinforce_many(self, n):
+        """
+        Decide where to place a number of armies, placing them one-by-one on the territory with
+        the highest reinforcement weight. Placing an army only changes the army vantage of the
+        territory itself, so the weights are updated without touching the board.
+
+        Args:
+            n (int): Number of armies to place.
+
+        Returns:
+            dict: Number of armies to place per territory ID.
+        """
+        territories = self.territories
+        features = self.features[territories]
+        armies = np.array([self.board.armies(tid) for tid in territories])
+        hostile_armies = np.array([sum(t.armies for t in self.board.hostile_neighbors(tid)) for tid in territories])
+        territory_mission = isinstance(self.mission, TerritoryMission) and len(territories) >= 18
+        allocation = Counter()
+        for _ in range(n):
+            weights = features.dot(self.vector(self.reinforce_weight_names))
+            options = np.flatnonzero(armies < 2) if territory_mission else []
+            best = options[np.argmax(weights[options])] if len(options) > 0 else np.argmax(weights)
+            armies[best] += 1
+            allocation[territories[best]] += 1
+            features[best, F['army_vantage']] = float(hostile_armies[best]) / (hostile_armies[best] + armies[best])
+        return dict(allocation)
 
     def reinforce_weight(self, territory_id):
-        return sum((
-            self.direct_bonus(territory_id) * self['re_dbonus_wgt'],
-            self.continent_value(territory_id) * self['re_ibonus_wgt'],
-            self.mission_value(territory_id) * self['re_mission_wgt'],
-            self.army_vantage(territory_id) * self['re_avantage_wgt'],
-            self.territory_vantage(territory_id) * self['re_tvantage_wgt']
-        ))
+        """
+        Calculate the reinforcement weight of a territory.
+
+        Args:
+            territory_id (int): ID of the territory.
+
+        Returns:
+            float: The weight of the territory.
+        """
+        return float(self.reinforce_weights([territory_id])[0])
+
+    def reinforce_weights(self, territories):
+        """
+        Calculate the reinforcement weights of a list of territories at once.
+
+        Args:
+            territories (list): List of territory IDs.
+
+        Returns:
+            np.ndarray: The weights of the territories.
+        """
+        return self.features[territories].dot(self.vector(self.reinforce_weight_names))
@@ -1,4 +1,6 @@
-from random import choice, gauss, random, uniform
+from random import choice, gauss, getrandbits, random, uniform
+
+import numpy as np
 
 
 class Gene(object):
@@ -32,7 +34,7 @@ class Gene(object):
 
     def mutate(self, value):
         if random() < self.volatility:
-            round(min(max((value + gauss(0, self.granularity)), self.min_value), self.max_value), self.precision)
+            return round(min(max((value + gauss(0, self.granularity)), self.min_value), self.max_value), self.precision)
         return value
 
 
@@ -66,33 +68,108 @@ class Genome(object):
     The specifications of the Genes, in the form of Gene or ListGene objects
     go into the specifications class variable.
 
+    The values of the genes are stored in a flat float array, in the order of
+    the specifications. The index of each gene name in this array is computed
+    once per class, see layout. Values of ListGenes must therefore be numbers.
+    Genomes are immutable, so their hash and weight vectors are cached.
+
     Args:
         genes (dict): Dict of all genes.
     """
     specifications = []
 
     def __init__(self, genes):
-        self.genes = genes
-        if len(set(self.gene_names)) < len(self.genes):
+        specifications, index, _ = self.layout()
+        if len(index) < len(specifications) or len(index) < len(genes):
             raise ValueError('Genome: genes must have unique names.')
+        self.index = index
+        self.values = np.array([genes[s.name] for s in specifications], dtype=np.float64)
+        self.vectors = {}
+        self._hash = None
 
     def __eq__(self, other):
-        return all((self.genes[name] == other.genes[name] for name in self.gene_names))
+        return np.array_equal(self.values, other.values)
+
+    def __ne__(self, other):
+        return not self == other
 
     def __getitem__(self, key):
-        return self.genes[key]
+        return self.values.item(self.index[key])
 
     def __hash__(self):
-        return hash(tuple(self[name] for name in self.gene_names))
+        if self._hash is None:
+            self._hash = hash(tuple(self.values.tolist()))
+        return self._hash
+
+    @classmethod
+    def layout(cls):
+        """
+        The layout of the gene array, which is computed once per class and specifications.
+
+        Returns:
+            tuple: The specifications, a dict with the index of each gene name in the gene array,
+                and the sorted gene names.
+        """
+        layout = cls.__dict__.get('_layout')
+        if layout is None or layout[0] is not cls.specifications:
+            index = {s.name: i for i, s in enumerate(cls.specifications)}
+            layout = (cls.specifications, index, sorted(index))
+            cls._layout = layout
+        return layout
 
     @classmethod
     def create(cls):
         genes = {s.name: s.initialize() for s in cls.specifications}
         return cls(genes)
 
+    @classmethod
+    def from_values(cls, values):
+        """
+        Create a Genome directly from an array of gene values.
+
+        Args:
+            values (np.ndarray): Gene values, in the order of the specifications.
+
+        Returns:
+            Genome: The new genome.
+        """
+        genome = cls.__new__(cls)
+        genome.index = cls.layout()[1]
+        genome.values = np.array(values, dtype=np.float64)
+        genome.vectors = {}
+        genome._hash = None
+        return genome
+
+    @property
+    def genes(self):
+        """
+        The genes as a dict, with the values of ListGenes in their original type.
+
+        Returns:
+            dict: Dict of all genes.
+        """
+        return {s.name: (next(v for v in s.values if v == value) if isinstance(s, ListGene) else value)
+                for s, value in zip(self.layout()[0], self.values.tolist())}
+
     @property
     def gene_names(self):
-        return sorted([g.name for g in self.specifications])
+        return self.layout()[2]
+
+    def vector(self, names):
+        """
+        Get the values of a number of genes as a vector, e.g. to take dot products with.
+
+        Args:
+            names (tuple): Names of the genes.
+
+        Returns:
+            np.ndarray: Array with the values of the genes.
+        """
+        try:
+            return self.vectors[names]
+        except KeyError:
+            vector = self.vectors[names] = self.values[[self.index[name] for name in names]]
+            return vector
 
     def combine(self, other):
         """
@@ -103,7 +180,8 @@ class Genome(object):
 
         Returns:
             Genome: A new genome object with a mixture of genes. """
-        return self.__class__({name: choice((self.genes[name], other.genes[name])) for name in self.gene_names})
+        mask = np.array([random() < 0.5 for _ in range(len(self.values))], dtype=bool)
+        return self.from_values(np.where(mask, self.values, other.values))
 
     def mutate(self):
         """
@@ -112,4 +190,110 @@ class Genome(object):
         Returns:
             Genome: A new genome with slightly modified genes.
         """
-        return self.__class__({s.name: s.mutate(self[s.name]) for s in self.specifications})
+        return self.from_values([s.mutate(value) for s, value in zip(self.layout()[0], self.values.tolist())])
+
+
+class Population(object):
+    """
+    A Population holds the genes of many Genomes of the same class as a single
+    (genomes x genes) matrix, in the layout of the Genome class. Selection,
+    uniform crossover and mutation are done on the whole population at once,
+    using per-gene vectors of the properties of the Genes:
+     - Genes mutate with a Gaussian step, after which they are clipped to their
+       range and rounded to their precision,
+     - ListGenes mutate by resampling from their values.
+
+    Args:
+        genome_cls (class): The Genome class of the population.
+        values (np.ndarray): Gene values of shape (genomes, genes).
+        rng (np.random.RandomState): Random number generator. Defaults to a generator
+            seeded from the random module.
+    """
+
+    def __init__(self, genome_cls, values, rng=None):
+        self.genome_cls = genome_cls
+        self.values = np.asarray(values, dtype=np.float64)
+        self.rng = rng or np.random.RandomState(getrandbits(32))
+        specifications = genome_cls.layout()[0]
+        self.is_list = np.array([isinstance(s, ListGene) for s in specifications])
+        self.volatility = np.array([s.volatility for s in specifications])
+        self.min_value = np.array([-np.inf if l else s.min_value for s, l in zip(specifications, self.is_list)])
+        self.max_value = np.array([np.inf if l else s.max_value for s, l in zip(specifications, self.is_list)])
+        self.granularity = np.array([0. if l else s.granularity for s, l in zip(specifications, self.is_list)])
+        self.scale = np.array([1. if l else 10. ** s.precision for s, l in zip(specifications, self.is_list)])
+        self.list_values = {j: np.array(s.values, dtype=np.float64)
+                            for j, (s, l) in enumerate(zip(specifications, self.is_list)) if l}
+
+    def __len__(self):
+        return len(self.values)
+
+    @classmethod
+    def from_genomes(cls, genomes, rng=None):
+        """
+        Create a Population from a list of Genomes of the same class.
+
+        Args:
+            genomes (list): List of Genomes.
+            rng (np.random.RandomState): Random number generator. Defaults to None.
+
+        Returns:
+            Population: The population.
+        """
+        return cls(genomes[0].__class__, [g.values for g in genomes], rng=rng)
+
+    def genomes(self):
+        """
+        Create a Genome for each row of the population.
+
+        Returns:
+            list: List of Genomes.
+        """
+        return [self.genome_cls.from_values(row) for row in self.values]
+
+    def select(self, indices):
+        """
+        Select a number of genomes.
+
+        Args:
+            indices (array-like): Indices of the selected genomes.
+
+        Returns:
+            Population: The selected genomes.
+        """
+        return self.__class__(self.genome_cls, self.values[indices], rng=self.rng)
+
+    def combine(self, mothers, fathers):
+        """
+        Create genomes by uniform crossover of pairs of genomes: each gene is taken from
+        either parent with equal probability.
+
+        Args:
+            mothers (array-like): Indices of the first parents.
+            fathers (array-like): Indices of the second parents.
+
+        Returns:
+            Population: The combined genomes.
+        """
+        mothers, fathers = self.values[mothers], self.values[fathers]
+        mask = self.rng.random_sample(mothers.shape) < 0.5
+        return self.__class__(self.genome_cls, np.where(mask, mothers, fathers), rng=self.rng)
+
+    def mutate(self, indices=None):
+        """
+        Create mutated copies of genomes, see Gene.mutate and ListGene.mutate.
+
+        Args:
+            indices (array-like): Indices of the genomes to mutate. Defaults to all genomes.
+
+        Returns:
+            Population: The mutated genomes.
+        """
+        values = self.values.copy() if indices is None else self.values[indices]
+        mutating = self.rng.random_sample(values.shape) < self.volatility
+        steps = self.rng.normal(size=values.shape) * self.granularity
+        mutated = np.round(np.clip(values + steps, self.min_value, self.max_value) * self.scale) / self.scale
+        values = np.where(mutating & ~self.is_list, mutated, values)
+        for j, list_values in self.list_values.items():
+            resampled = mutating[:, j]
+            values[resampled, j] = list_values[self.rng.randint(len(list_values), size=resampled.sum())]
+        return self.__class__(self.genome_cls, values, rng=self.rng)
@@ -91,7 +91,7 @@ class TerritoryMission(BaseMission):
 
     def _criterium(self, board):
         """ Return the number of territories owned by the player, with at least the minimum number of armies. """
-        return len([tid for (tid, pid, arm) in board.data if (pid == self.player_id and arm >= 2)])
+        return board.n_mobile(self.player_id)
 
     def _evaluate(self, board):
         """ The mission is successful if the number of territories is equal or larger than the minimum. """
@@ -156,7 +156,7 @@ class ContinentMission(BaseMission):
 
     def _evaluate(self, board):
         for continent_id in self.continents:
-            if board.continent_owner(continent_id) != self.player_id:
+            if not board.owns_continent(self.player_id, continent_id):
                 return False
         return True
 
@@ -179,7 +179,7 @@ class ExtraContinentMission(ContinentMission):
 
     def _evaluate(self, board):
         for continent_id in self.continents:
-            if board.continent_owner(continent_id) != self.player_id:
+            if not board.owns_continent(self.player_id, continent_id):
                 return False
         return board.n_continents(self.player_id) > len(self.continents)
 
@@ -1,19 +1,56 @@
 import random
+from collections import Counter, namedtuple
 
+import numpy as np
+
+import battle
 import definitions
 import missions
 
 
+class AttackPlan(namedtuple('AttackPlan', ['from_territory_id', 'to_territory_id', 'min_ratio', 'max_losses',
+                                           'condition'])):
+    """
+    A plan to keep attacking a territory with all armies but one. The plan is executed
+    roll-by-roll by the Game without consulting the player, until the territory is conquered,
+    no attacking armies are left, or after a roll one of the conditions of the plan fails.
+    The first roll is always executed.
+
+    Args:
+        from_territory_id (int): ID of the attacking territory.
+        to_territory_id (int): ID of the defending territory.
+        min_ratio (float): Minimum ratio of attacking to defending armies. Defaults to 0.
+        max_losses (int/None): Stop when this number of attacking armies is lost. Defaults to None.
+        condition (callable/None): Function of (attackers, defenders) that must return True to
+            continue. Defaults to None.
+    """
+    __slots__ = ()
+
+    def __new__(cls, from_territory_id, to_territory_id, min_ratio=0., max_losses=None, condition=None):
+        return super(AttackPlan, cls).__new__(cls, from_territory_id, to_territory_id, min_ratio, max_losses,
+                                              condition)
+
+
 class Player(object):
     """
     The Player object is the Base object on which to build players.
     It has internal references to the game, so that it can look up
     its position on the board, its cards and its mission.
+
+    A player can be given a cache (e.g. an LRUCache), in which it stores
+    per-state values keyed on the state hash of the board. Positions that
+    occur repeatedly are then evaluated only once.
+
+    The available moves and territories of the player are memoized per
+    version of the board, so reading them repeatedly between two changes
+    of the board costs nothing.
     """
+    cache = None
 
     def __init__(self):
         self.game = None
         self.player_id = None
+        self.memo = {}
 
     @property
     def color(self):
@@ -31,6 +68,7 @@ class Player(object):
         """
         self.game = None
         self.player_id = None
+        self.memo = {}
 
     def join(self, game, player_id):
         """
@@ -42,6 +80,7 @@ class Player(object):
         """
         self.game = game
         self.player_id = player_id
+        self.memo = {}
 
     @property
     def board(self):
@@ -91,6 +130,41 @@ class Player(object):
         except AttributeError:
             raise ValueError('Cannot access mission: player is unassigned.')
 
+    def cached(self, key, compute):
+        """
+        Look up a per-state value in the cache, computing it if it is unknown. The
+        key is extended with the state hash of the board and the player id.
+
+        Args:
+            key (tuple): Key identifying the value within the board state.
+            compute (callable): Function without arguments that computes the value.
+
+        Returns:
+            The cached or computed value.
+        """
+        if self.cache is None:
+            return compute()
+        return self.cache.lookup((self.board.state_hash, self.player_id) + key, compute)
+
+    def versioned(self, name, compute):
+        """
+        Look up a value memoized for the current version of the board, computing it
+        if the board has changed since it was last computed.
+
+        Args:
+            name (str): Name of the value.
+            compute (callable): Function without arguments that computes the value.
+
+        Returns:
+            The memoized or computed value.
+        """
+        board = self.board
+        memo_board, version, value = self.memo.get(name, (None, None, None))
+        if memo_board is not board or version != board.version:
+            value = compute()
+            self.memo[name] = (board, board.version, value)
+        return value
+
     # ===================== #
     # == Available Moves == #
     # ===================== #
@@ -103,7 +177,7 @@ class Player(object):
         Returns:
             list: List of all territory IDs owner by the player.
         """
-        return self.board.territories_of(self.player_id)
+        return self.versioned('territories', lambda: self.board.territories_of(self.player_id))
 
     @property
     def attacks(self):
@@ -113,7 +187,8 @@ class Player(object):
         Returns:
             list: List of Moves.
         """
-        return self.board.possible_attacks(self.player_id)
+        return self.versioned('attacks', lambda: self.cached(
+            ('attacks',), lambda: self.board.possible_attacks(self.player_id)))
 
     @property
     def fortifications(self):
@@ -123,7 +198,8 @@ class Player(object):
         Returns:
             list: List of Moves.
         """
-        return self.board.possible_fortifications(self.player_id)
+        return self.versioned('fortifications', lambda: self.cached(
+            ('fortifications',), lambda: self.board.possible_fortifications(self.player_id)))
 
     ######################
     # == Play Methods == #
@@ -133,11 +209,15 @@ class Player(object):
         """
         Decide which attack to make, if any.
 
+        Instead of a single attack, a player may return an AttackPlan, which the
+        Game executes roll-by-roll.
+
         Args:
             won_yet (bool): True if player has won a territory yet in this turn.
 
         Returns:
-            tuple/None: Tuple of the form (from_territory_id, to_territory_id, num_armies).
+            tuple/AttackPlan/None: Tuple of the form (from_territory_id, to_territory_id, num_armies),
+                or an AttackPlan.
         """
         if len(self.attacks) == 0 or won_yet:
             return None
@@ -165,6 +245,26 @@ class Player(object):
         """
         return self.territories[0]
 
+    def reinforce_many(self, n):
+        """
+        Decide where to place a number of armies. By default, the armies are placed
+        one-by-one with reinforce, on a snapshot of the board which is reverted afterwards.
+
+        Args:
+            n (int): Number of armies to place.
+
+        Returns:
+            dict: Number of armies to place per territory ID.
+        """
+        allocation = Counter()
+        token = self.board.snapshot()
+        for _ in range(n):
+            territory_id = self.reinforce()
+            self.board.add_armies(territory_id, 1)
+            allocation[territory_id] += 1
+        self.board.revert(token)
+        return dict(allocation)
+
     def turn_in_cards(self):
         """
         Decide whether or not to turn in cards, if possible.
@@ -182,7 +282,48 @@ class SmartPlayer(Player):
     """
     The SmartPlayer builds on the Player object and adds many methods
     which can be used to make informed decisions.
+
+    The per-territory features are collected in a feature table, which is
+    kept up to date with the board, see features.
     """
+    feature_names = ('direct_bonus', 'continent_value', 'mission_value', 'army_vantage', 'territory_vantage')
+
+    @property
+    def features(self):
+        """
+        The feature table of all territories, with one row per territory and one column per
+        feature (see feature_names). The table is computed once per version of the board. If
+        only armies have changed since, only the army vantage of the changed territories and
+        their neighbors is recomputed.
+
+        Returns:
+            np.ndarray: Feature table of shape (42, len(feature_names)).
+        """
+        board = self.board
+        table_board, version, table = self.memo.get('features', (None, None, None))
+        if table_board is not board or version != board.version:
+            changes = board.changes_since(version) if table_board is board else None
+            if changes is None or any(owner_changed for _, owner_changed in changes):
+                table = self.feature_table()
+            else:
+                column = self.feature_names.index('army_vantage')
+                changed = set(territory_id for territory_id, _ in changes)
+                for territory_id in list(changed):
+                    changed.update(definitions.territory_neighbor_ids[territory_id])
+                for territory_id in changed:
+                    table[territory_id, column] = self.army_vantage(territory_id)
+            self.memo['features'] = (board, board.version, table)
+        return table
+
+    def feature_table(self):
+        """
+        Compute the feature table from scratch, see features.
+
+        Returns:
+            np.ndarray: Feature table of shape (42, len(feature_names)).
+        """
+        return np.array([[getattr(self, name)(territory_id) for name in self.feature_names]
+                         for territory_id in range(42)], dtype=float)
 
     @staticmethod
     def army_ratio(move):
@@ -226,32 +367,24 @@ class SmartPlayer(Player):
     def chance_ratio(cls, move):
         """
         Calculate the ratio of the chances to lose armies to inflicting damage to foreign armies.
-        This only depends on the number of dices.
+        This only depends on the number of dices, and is calculated exactly from the dice outcomes.
 
         Returns:
             float: chance ratio, where lower is better [0.5, 3].
         """
-        chances = [[1.41, 0.73, 0.52], [2.89, 1.57, 0.85]]
-        return chances[min(move.to_armies - 1, 1)][min(move.from_armies - 2, 2)]
+        return battle.chance_ratios[min(move.to_armies - 1, 1)][min(move.from_armies - 2, 2)]
 
     @staticmethod
     def conquering_chance(move):
         """
-        Provides an estimate of the probability to
-        conquer a territory based on the number of attacking and
-        defending armies. This estimate is accurate at the 1% level.
+        Provides the exact probability to conquer a territory when attacking
+        with all armies until either side is defeated, based on the number of
+        attacking and defending armies. See BattleTable.
 
         Returns:
             float: chance of conquering the territory [0, 1].
         """
-        n_att = move.from_armies - 1.
-        n_def = move.to_armies
-        if n_att < 1:
-            return 0.
-        if n_att > n_def:
-            return (n_att * 1.5) / (n_att + n_def)
-        else:
-            return (n_att * 1.25) / (n_att + n_def)
+        return float(battle.table().win_probability(move.from_armies - 1, move.to_armies))
 
     def continent_value(self, territory_id):
         """
@@ -296,6 +429,11 @@ class SmartPlayer(Player):
         Returns:
             float: Mission value.
         """
+        return self.cached(('mission_value', self.mission.description, territory_id),
+                           lambda: self._mission_value(territory_id))
+
+    def _mission_value(self, territory_id):
+        """ Calculate the mission value of a territory, see mission_value. """
         if isinstance(self.mission, missions.PlayerMission):
             if self.mission.target_id == self.player_id:
                 return self.board.n_territories(self.player_id) < 24
@@ -326,9 +464,8 @@ class SmartPlayer(Player):
         Returns:
             float: fraction of neighbors that are hostily [0, 1].
         """
-        htl_nb = len(list(self.board.hostile_neighbors(territory_id)))
-        own_nb = len(list(self.board.friendly_neighbors(territory_id)))
-        return float(htl_nb) / (htl_nb + own_nb)
+        n_neighbors = len(definitions.territory_neighbor_ids[territory_id])
+        return float(self.board.n_hostile_neighbors(territory_id)) / n_neighbors
 
     def territory_vantage_difference(self, move):
         """
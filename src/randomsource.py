@@ -0,0 +1,80 @@
+import random
+
+import numpy as np
+
+
+class RandomSource(object):
+    """
+    The RandomSource supplies the random numbers of a single game. Instead of
+    calling the random module for every dice, it draws dice and uniform
+    random numbers in blocks from a NumPy random generator, and refills a
+    block once it is used up. A RandomSource is seedable, such that games
+    can be reproduced. Without a seed, it is seeded from the random module,
+    so that random.seed still makes a sequence of games reproducible.
+
+    Args:
+        seed (int): Seed of the generator. Defaults to None.
+        block_size (int): Number of values drawn at once. Defaults to 1024.
+    """
+
+    def __init__(self, seed=None, block_size=1024):
+        self.seed = random.getrandbits(32) if seed is None else seed
+        self.block_size = block_size
+        self.state = np.random.RandomState(self.seed)
+        self.dice_block, self.dice_index = [], 0
+        self.uniform_block, self.uniform_index = [], 0
+
+    def __repr__(self):
+        return '{cls}(seed={seed})'.format(cls=self.__class__.__name__, seed=self.seed)
+
+    def dice(self, n):
+        """
+        Throw a number of dices.
+
+        Args:
+            n (int): Number of dices.
+
+        Returns:
+            list: List of n random ints in [1, 6].
+        """
+        if self.dice_index + n > len(self.dice_block):
+            self.dice_block = self.dice_block[self.dice_index:] + self.state.randint(1, 7, self.block_size).tolist()
+            self.dice_index = 0
+        self.dice_index += n
+        return self.dice_block[self.dice_index - n:self.dice_index]
+
+    def random(self):
+        """
+        Draw a uniform random number.
+
+        Returns:
+            float: Random float in [0, 1>.
+        """
+        if self.uniform_index == len(self.uniform_block):
+            self.uniform_block, self.uniform_index = self.state.random_sample(self.block_size).tolist(), 0
+        self.uniform_index += 1
+        return self.uniform_block[self.uniform_index - 1]
+
+    def randint(self, low, high):
+        """
+        Draw a random integer.
+
+        Args:
+            low (int): Lower bound.
+            high (int): Upper bound, inclusive.
+
+        Returns:
+            int: Random int in [low, high].
+        """
+        return low + int(self.random() * (high - low + 1))
+
+    def shuffle(self, values):
+        """
+        Shuffle a list in place.
+
+        Args:
+            values (list): The list to shuffle.
+        """
+        for i in range(len(values) - 1, 0, -1):
+            j = self.randint(0, i)
+            values[i], values[j] = values[j], values[i]
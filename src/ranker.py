@@ -1,7 +1,97 @@
 import itertools
+import math
 import random
+from collections import Counter, OrderedDict
+
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from trueskill import Rating, TrueSkill
+
 import game
-from trueskill import TrueSkill
+from batch import BatchGame
+from genome import Genome
+
+
+def play(players, max_turns, seed=None):
+    """
+    Play a single game. If a seed is given, both the game and the random module are seeded with it, such
+    that the outcome only depends on the players and the seed. The state of the random module is restored
+    afterwards.
+
+    Args:
+        players (list): List of Player objects.
+        max_turns (int): Maximum number of turns to play.
+        seed (int): Seed of the game. Defaults to None.
+
+    Returns:
+        int/None: Index of the winning player, or None if there is no winner.
+    """
+    state = random.getstate()
+    if seed is not None:
+        random.seed(seed)
+    try:
+        g = game.Game.create(players, seed=seed)
+        g.initialize_armies()
+        for i in range(max_turns):
+            g.play_turn()
+            if g.has_ended():
+                break
+        winner = g.winner()
+        return None if winner is None else winner.player_id
+    finally:
+        for p in players:
+            p.clear()
+        if seed is not None:
+            random.setstate(state)
+
+
+def seat(player):
+    """
+    Describe a player by its class and genes, such that it can be recreated in another process.
+
+    Args:
+        player (Player): The player.
+
+    Returns:
+        tuple: Player class and gene values (None if the player has no genome).
+    """
+    return player.__class__, (player.values if isinstance(player, Genome) else None)
+
+
+def play_seats(seats, max_turns, seed):
+    """
+    Recreate the players from their seats and play a single game, see play.
+
+    Args:
+        seats (list): List of seats, see seat.
+        max_turns (int): Maximum number of turns to play.
+        seed (int): Seed of the game.
+
+    Returns:
+        int/None: Index of the winning player, or None if there is no winner.
+    """
+    players = [player_cls() if values is None else player_cls.from_values(values) for player_cls, values in seats]
+    return play(players, max_turns, seed)
+
+
+def rank_correlation(ranking, reference):
+    """
+    Calculate the Spearman rank correlation of two rankings, over the players that occur in both.
+
+    Args:
+        ranking (list): List of player ids, ordered from best to worst.
+        reference (list): List of player ids, ordered from best to worst.
+
+    Returns:
+        float: Rank correlation [-1, 1]. Returns 1 if less than two players occur in both.
+    """
+    common = set(ranking) & set(reference)
+    n = len(common)
+    if n < 2:
+        return 1.
+    position = {pid: i for i, pid in enumerate(pid for pid in reference if pid in common)}
+    difference = np.arange(n) - np.array([position[pid] for pid in ranking if pid in common])
+    return 1. - 6. * np.dot(difference, difference) / (n * (n ** 2 - 1.))
 
 
 class TrueskillRanker (object):
@@ -60,6 +150,69 @@ class TrueskillRanker (object):
         return self.ts.expose(self[player_id])
 
 
+class RatingStore(object):
+    """
+    The RatingStore keeps the ratings of players across rankers, such that a player that returns in a
+    later generation of the GA starts from the evidence gathered about it before. Players are keyed by
+    their hash, which for a Genome is the hash of its genes, so a copy with the same genes shares the
+    rating. Next to the rating, the store counts the rated games of a player.
+
+    Args:
+        sigma_inflation (float): Uncertainty added to the sigma of a returning player (in quadrature),
+            since its opponents have changed in the meantime. Defaults to 0.
+    """
+
+    def __init__(self, sigma_inflation=0.):
+        self.sigma_inflation = sigma_inflation
+        self.entries = {}
+
+    def __repr__(self):
+        return '{cls}({n})'.format(cls=self.__class__.__name__, n=len(self))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, player):
+        return hash(player) in self.entries
+
+    def get(self, player):
+        """
+        Look up the rating of a player, with inflated sigma.
+
+        Args:
+            player (Player): The player.
+
+        Returns:
+            tuple: The rating (None if the player is unknown) and the number of rated games.
+        """
+        try:
+            rating, games = self.entries[hash(player)]
+        except KeyError:
+            return None, 0
+        return Rating(mu=rating.mu, sigma=math.sqrt(rating.sigma ** 2 + self.sigma_inflation ** 2)), games
+
+    def put(self, player, rating, games):
+        """
+        Store the rating of a player.
+
+        Args:
+            player (Player): The player.
+            rating (Rating): The rating.
+            games (int): Number of rated games.
+        """
+        self.entries[hash(player)] = (rating, games)
+
+    def retain(self, players):
+        """
+        Forget all players except the given ones.
+
+        Args:
+            players (iterable): Iterable of players to keep.
+        """
+        keys = set(hash(p) for p in players)
+        self.entries = {key: entry for key, entry in self.entries.items() if key in keys}
+
+
 class RiskRanker (TrueskillRanker):
     """
     The RiskRanker is a TrueskillRanker which handles the full process of ranking a set of players,
@@ -69,42 +222,251 @@ class RiskRanker (TrueskillRanker):
         players (iterable): Iterable of Player objects. These players will be ranked.
         n_players (int): Number of players in a game. Defaults to 4.
         max_turns (int): Maximum number of turns to play. This prevents dead situations. Defaults to 1500.
+        batched (bool): Play all games of an iteration at once in a BatchGame. Only RandomPlayers and
+            GeneticPlayers are supported. Defaults to False.
+        processes (int/None): Number of processes to play the games of an iteration in. With 1, the games
+            are played in this process; otherwise the players are shipped to a process pool as their class
+            and genes. None uses all cores. Every game gets its own seed, so the ranking does not depend
+            on the number of processes. The process pool is started on first use and kept for later
+            iterations, until close is called. Defaults to 1.
+        executor (ProcessPoolExecutor): Process pool to play the games in, instead of starting one. It is shared,
+            so close does not shut it down. Overrides processes. Defaults to None.
+        coordinator (Coordinator): Coordinator to hand out the games to, such that they are played by remote
+            workers, see distributed.Coordinator. Overrides processes. Defaults to None.
+        schedule (str): How the games of an iteration are formed. With 'uniform', the players are pooled at
+            random, such that every player plays at least one game. With 'adaptive', the same number of games is
+            played in rounds, in which the most uncertain players play first, against the opponents that give
+            the best match quality, see adaptive_pools. Defaults to 'uniform'.
+        rounds (int): Number of rounds per iteration of the adaptive schedule. Defaults to 2.
+        candidates (int): Number of candidate opponents per seat of the adaptive schedule. Defaults to 8.
+        store (RatingStore): Store to warm-start the ratings from, and to write the new ratings to. A player
+            that already played n rated games before only takes part in the later iterations of run(n) to
+            fill up games, such that new players get the most games. Defaults to None.
         **kwargs: Arguments to pass to TrueSkill.
     """
     
-    def __init__(self, players, n_players=4, max_turns=1500, **kwargs):
+    def __init__(self, players, n_players=4, max_turns=1500, batched=False, processes=1, coordinator=None,
+                 store=None, schedule='uniform', rounds=2, candidates=8, executor=None, **kwargs):
+        if schedule not in ('uniform', 'adaptive'):
+            raise ValueError('Unknown schedule {schedule}!'.format(schedule=schedule))
         super(RiskRanker, self).__init__(**kwargs)
         self.players = {}
         self.initialize(players)
         self.n_players = n_players
         self.max_turns = max_turns
+        self.batched = batched
+        self.processes = processes
+        self.executor = executor
+        self.own_executor = False
+        self.coordinator = coordinator
+        self.store = store
+        self.schedule = schedule
+        self.rounds = rounds
+        self.candidates = candidates
+        self.games = Counter()
+        self.prior_games = {}
+        self.n_games = 0
+        self.ranking = []
+        self.convergence = []
+        if store is not None:
+            self.warm_start()
              
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def initialize(self, players):
         """
-        Initialize player dictionary.
+        Initialize player dictionary. The players are kept in the given order, such that the player pools
+        only depend on the state of the random module.
 
         Args:
             players (iterable): Iterable of Player objects.
         """
-        self.players = {id(p): p for p in players}
+        self.players = OrderedDict((id(p), p) for p in players)
         if not len(players) == len(self.players):
             raise ValueError('A player may only be passed once!')
 
-    def iteration(self):
-        """ Run a single iteration: i.e. have every player play at least one game. """
-        for pool in self.player_pools():
-            self.play_game(pool)
+    def warm_start(self):
+        """
+        Initialize the ratings and game counts of the players known to the store. The game counts are also kept
+        as prior_games, see run.
+        """
+        for pid, player in self.players.items():
+            rating, games = self.store.get(player)
+            if rating is not None:
+                self.ratings[pid] = rating
+                self.games[pid] = games
+                self.prior_games[pid] = games
+
+    def iteration(self, player_ids=None):
+        """
+        Run a single iteration: i.e. have every player play at least one game. With the adaptive schedule, the
+        same number of games is played in rounds, see adaptive_pools.
+
+        Args:
+            player_ids (iterable): Iterable of the ids of the players that must play. The other players only
+                fill up the games. Defaults to all players.
+        """
+        if self.schedule == 'uniform':
+            self.play_pools(list(self.player_pools(player_ids)))
+            return
+        player_ids = self.player_ids if player_ids is None else list(player_ids)
+        n_games = int(math.ceil(len(player_ids) / float(self.n_players)))
+        for i in range(self.rounds):
+            round_games = n_games * (i + 1) // self.rounds - n_games * i // self.rounds
+            if round_games > 0:
+                self.play_pools(self.adaptive_pools(player_ids, round_games))
+
+    def play_pools(self, pools):
+        """
+        Play a set of games, and update the scores in the order of the pools.
+
+        Args:
+            pools (list): List of player pools, each represented by a list of player ids.
+        """
+        if self.batched:
+            self.play_batch(pools)
+            return
+        seeds = [random.getrandbits(32) for _ in pools]
+        if self.processes == 1 and self.executor is None and self.coordinator is None:
+            for pool, seed in zip(pools, seeds):
+                self.play_game(pool, seed=seed)
+            return
+        seats = [[seat(self.players[pid]) for pid in pool] for pool in pools]
+        if self.coordinator is not None:
+            winners = self.coordinator.map(seats, self.max_turns, seeds)
+        else:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.processes)
+                self.own_executor = True
+            winners = list(self.executor.map(play_seats, seats, itertools.repeat(self.max_turns), seeds))
+        for pool, winner in itertools.izip(pools, winners):
+            self.record(pool, winner)
+
+    def close(self):
+        """
+        Shut down the process pool, if the ranker started it.
+        """
+        if self.own_executor:
+            self.executor.shutdown()
+            self.executor = None
+            self.own_executor = False
             
-    def run(self, n):
+    def run(self, n, tolerance=None, k=None, sigma_tolerance=None):
         """
-        Run n iterations.
+        Run at most n iterations. With a store, iteration i is played by the players that had less than n - i
+        rated games in the store when the ranker was created, see RiskRanker. After every iteration, the
+        convergence of the ranking is tracked, see track. The run stops early once every given tolerance is met.
 
         Args:
-            n (int): Number of iterations to run.
+            n (int): Maximum number of iterations to run.
+            tolerance (float): Stop when the rank correlation with the ranking of the previous iteration is at
+                least 1 - tolerance. Defaults to None.
+            k (int): Number of players that is selected from the ranking, see track. Defaults to None.
+            sigma_tolerance (float): Stop when the maximum sigma of the players near the selection cutoff is at
+                most sigma_tolerance. Requires k. Defaults to None.
         """
+        if sigma_tolerance is not None and k is None:
+            raise ValueError('A sigma tolerance requires the number of selected players!')
         for i in range(n):
-            self.iteration()
-            
+            player_ids = self.player_ids
+            if self.store is not None:
+                player_ids = [pid for pid in player_ids if self.prior_games.get(pid, 0) + i < n]
+            if not player_ids:
+                break
+            self.iteration(player_ids)
+            metrics = self.track(k)
+            if tolerance is None and sigma_tolerance is None:
+                continue
+            if tolerance is not None and (metrics['correlation'] is None or
+                                          metrics['correlation'] < 1. - tolerance):
+                continue
+            if sigma_tolerance is not None and metrics['cutoff_sigma'] > sigma_tolerance:
+                continue
+            break
+
+    def track(self, k=None, confidence=2.):
+        """
+        Record the convergence metrics of the current ranking in the convergence list: the iteration, the number
+        of games played, the rank correlation with the ranking of the previous call (None on the first call),
+        and, if k is given, the number of players that are contested for the k best (see contested) and their
+        maximum sigma (0 if there are none).
+
+        Args:
+            k (int): Number of players that is selected from the ranking. Defaults to None.
+            confidence (float): Width of the confidence bounds, in sigmas, see contested. Defaults to 2.
+
+        Returns:
+            dict: The metrics.
+        """
+        ranking = [pid for pid, _ in self.rank()]
+        metrics = {'iteration': len(self.convergence) + 1, 'games': self.n_games,
+                   'correlation': rank_correlation(ranking, self.ranking) if self.ranking else None,
+                   'contested': None, 'cutoff_sigma': None}
+        if k is not None:
+            contested = self.contested(self.player_ids, k, confidence)
+            metrics['contested'] = len(contested)
+            metrics['cutoff_sigma'] = max([self[pid].sigma for pid in contested] or [0.])
+        self.ranking = ranking
+        self.convergence.append(metrics)
+        return metrics
+
+    def race(self, n, k, warmup=2, confidence=2.):
+        """
+        Select the k best players by racing: play the budget of run(n), ceil(players / n_players) games per iteration,
+        but only the first warmup iterations with all players. Before the first and after every iteration, the players
+        that are decided are retired: those whose upper bound mu + confidence * sigma falls below the mu of the k-th
+        best player, and those whose lower bound mu - confidence * sigma lies above the mu of the (k+1)-th best player.
+        The remaining budget is spent on the contested players, in as many iterations as it takes; the retired players
+        only fill up their games. The last iteration may overrun the budget. The players are ranked by mu, which keeps
+        the retired players on their side of the selection, whatever their sigma. The convergence is tracked after every
+        iteration, see track.
+
+        Args:
+            n (int): Number of iterations of the game budget.
+            k (int): Number of players to select.
+            warmup (int): Number of iterations played by all players. Defaults to 2.
+            confidence (float): Width of the confidence bounds, in sigmas. Defaults to 2.
+
+        Returns:
+            list: List of player objects. The first k players are the selection, the first player is the best.
+        """
+        budget = self.n_games + n * int(math.ceil(len(self.players) / float(self.n_players)))
+        contested = self.contested(self.player_ids, k, confidence)
+        i = 0
+        while self.n_games < budget and contested:
+            n_games = self.n_games
+            self.iteration(contested if i >= warmup else None)
+            if self.n_games == n_games:
+                break
+            contested = self.contested(contested, k, confidence)
+            self.track(k, confidence)
+            i += 1
+        return [self.players[pid] for pid in sorted(self.player_ids, key=lambda pid: self[pid].mu, reverse=True)]
+
+    def contested(self, player_ids, k, confidence=2.):
+        """
+        Filter the players whose membership of the k best players is not yet decided, see race.
+
+        Args:
+            player_ids (iterable): Iterable of the ids of the players to filter.
+            k (int): Number of players to select.
+            confidence (float): Width of the confidence bounds, in sigmas. Defaults to 2.
+
+        Returns:
+            list: List of the ids of the contested players.
+        """
+        if not 0 < k < len(self.players):
+            return []
+        mus = sorted((self[pid].mu for pid in self.player_ids), reverse=True)
+        upper, lower = mus[k - 1], mus[k]
+        return [pid for pid in player_ids
+                if self[pid].mu + confidence * self[pid].sigma >= upper
+                and self[pid].mu - confidence * self[pid].sigma <= lower]
+
     def ranked_players(self):
         """
         Rank the players.
@@ -114,43 +476,101 @@ class RiskRanker (TrueskillRanker):
         """
         return [self.players[pid] for pid, _ in self.rank()]
                 
-    def play_game(self, player_ids):
+    def play_game(self, player_ids, seed=None):
         """
         Play a single game.
 
         Args:
             player_ids (list): List of player ids that will play.
+            seed (int): Seed of the game, see play. Defaults to None.
         """
         players = [self.players[pid] for pid in player_ids]
         for pid in player_ids:
             if id(self.players[pid]) != pid:
                 raise Exception('Player changed id!')
-        g = game.Game.create(players)
-        g.initialize_armies()
-        for i in range(self.max_turns):
-            g.play_turn()
-            if g.has_ended():
-                break
-        if g.winner() is not None:
-            winner_pid = id(g.winner())
-            self.update([winner_pid], [pid for pid in player_ids if winner_pid != pid])
-        for p in players:
-            p.clear()
+        self.record(player_ids, play(players, self.max_turns, seed=seed))
+
+    def record(self, player_ids, winner):
+        """
+        Update the scores with the outcome of a game.
+
+        Args:
+            player_ids (list): List of player ids that played.
+            winner (int/None): Index of the winning player, or None if there is no winner.
+        """
+        self.n_games += 1
+        if winner is None:
+            return
+        winner_pid = player_ids[winner]
+        self.update([winner_pid], [pid for pid in player_ids if winner_pid != pid])
+        for pid in player_ids:
+            self.games[pid] += 1
+            if self.store is not None:
+                self.store.put(self.players[pid], self.ratings[pid], self.games[pid])
             
+    def play_batch(self, pools):
+        """
+        Play a batch of games at once, and update the scores in the order of the pools.
+
+        Args:
+            pools (list): List of player pools, each represented by a list of player ids.
+        """
+        winners = BatchGame.from_players([[self.players[pid] for pid in pool] for pool in pools]).run(self.max_turns)
+        for pool, winner in zip(pools, winners):
+            self.record(pool, winner if winner >= 0 else None)
+
     @property
     def player_ids(self):
         return self.players.keys()
         
-    def player_pools(self):
+    def player_pools(self, player_ids=None):
         """
         Randomly create player pool that will play against each other. The last pool will be filled up with random
         players, such that every player will be in at least one pool.
 
+        Args:
+            player_ids (iterable): Iterable of the ids of the players that must be in a pool. Defaults to all players.
+
         Returns:
             list of lists: List of player pools, each represented by a list of player ids.
         """
-        ids = self.player_ids
+        ids = self.player_ids if player_ids is None else list(player_ids)
         random.shuffle(ids)
         while len(ids) % self.n_players > 0:
-            ids.append(random.choice(list(set(ids)-set(ids[-self.n_players:]))))
+            last = set(ids[-self.n_players:])
+            ids.append(random.choice([pid for pid in self.player_ids if pid not in last]))
         return itertools.izip(*[itertools.islice(ids, i, None, self.n_players) for i in range(self.n_players)])
+
+    def adaptive_pools(self, player_ids, n_games):
+        """
+        Form games from the current ratings. The players that must play are taken in order of decreasing sigma
+        (the most uncertain first). Each of them opens a game, which is filled up seat by seat with the candidate
+        opponent that gives the highest TrueSkill match quality, out of a random sample of the players that
+        are not yet in a game. Every player plays at most one of the games.
+
+        Args:
+            player_ids (list): List of the ids of the players that must play.
+            n_games (int): Maximum number of games.
+
+        Returns:
+            list of lists: List of player pools, each represented by a list of player ids.
+        """
+        ids = list(player_ids)
+        random.shuffle(ids)
+        ids.sort(key=lambda pid: self[pid].sigma, reverse=True)
+        available = self.player_ids
+        pools = []
+        for pid in ids:
+            if len(pools) == n_games or len(available) < self.n_players:
+                break
+            if pid not in available:
+                continue
+            available.remove(pid)
+            pool = [pid]
+            while len(pool) < self.n_players:
+                candidates = random.sample(available, min(self.candidates, len(available)))
+                best = max(candidates, key=lambda c: self.ts.quality([(self[p],) for p in pool + [c]]))
+                available.remove(best)
+                pool.append(best)
+            pools.append(pool)
+        return pools
@@ -1,8 +1,11 @@
 import json
 import random
 
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 
+from genome import Population
 from ranker import RiskRanker
 
 
@@ -19,17 +22,58 @@ class PlayerPool(object):
         n_players (int): Number of players in a game. Defaults to 4.
         pool_size (int): Size of the gene pool. Defaults to 150.
         ranking_iterations (int): Number of games to play to create a rank. Defaults to 12.
+        batched (bool): Play the ranking games in lockstep batches, see BatchGame. Defaults to False.
+        processes (int/None): Number of processes to play the ranking games in, see RiskRanker. The process pool
+            is started once and shared by the rankings of all generations, until close is called. Defaults to 1.
+        coordinator (Coordinator): Coordinator to hand out the ranking games to, see RiskRanker. Defaults to None.
+        store (RatingStore): Store that keeps the ratings of the players across generations, such that the
+            survivors are not ranked from scratch, see RiskRanker. Defaults to None.
+        selection (str): How the ranking games are spent. With 'rank', all players play every ranking iteration.
+            With 'racing', the game budget of the ranking iterations is spent on the players whose membership of
+            the best quarter is still contested, see RiskRanker.race. Defaults to 'rank'.
+        tolerance (float): Stop ranking once the rank correlation of successive iterations is at least
+            1 - tolerance, see RiskRanker.run. Defaults to None.
+        sigma_tolerance (float): Stop ranking once the maximum sigma of the players contested for the best quarter
+            is at most sigma_tolerance, see RiskRanker.run. Defaults to None.
     """
 
     def __init__(self, player_cls, genes=tuple(),
-                 max_turns=1500, n_players=4, pool_size=150, ranking_iterations=12):
+                 max_turns=1500, n_players=4, pool_size=150, ranking_iterations=12, batched=False,
+                 processes=1, coordinator=None, store=None, selection='rank',
+                 tolerance=None, sigma_tolerance=None):
+        if selection not in ('rank', 'racing'):
+            raise ValueError('Unknown selection {selection}!'.format(selection=selection))
         self.iteration_counter = 0
         self.max_turns = max_turns
+        self.batched = batched
+        self.processes = processes
+        self.executor = None
+        self.coordinator = coordinator
+        self.store = store
+        self.selection = selection
+        self.tolerance = tolerance
+        self.sigma_tolerance = sigma_tolerance
+        self.n_games = 0
         self.n_players = n_players
         self.pool_size = pool_size
         self.ranking_iterations = ranking_iterations
         self.pool = self.initialize_players(player_cls, pool_size, genes)
         self.log = [self.gene_df]
+        self.convergence_log = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Shut down the process pool of the ranking games, if it was started.
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
 
     @property
     def genes(self):
@@ -77,6 +121,15 @@ class PlayerPool(object):
         """
         pd.concat(self.log).to_csv(filename)
 
+    def save_convergence(self, filename):
+        """
+        Save the convergence metrics of every ranking iteration to a CSV file, see RiskRanker.track.
+
+        Args:
+            filename (str): Path to the log file.
+        """
+        pd.concat(self.convergence_log).to_csv(filename, index=False)
+
     @staticmethod
     def initialize_players(player_cls, pool_size, genes=tuple()):
         """
@@ -100,12 +153,31 @@ class PlayerPool(object):
         """
         self.iteration_counter += 1
         self.rank()
-        good_players = self.pool[:self.pool_size / 4]
-        comb_players = [random.choice(self.pool).combine(random.choice(self.pool)) for _ in range(self.pool_size / 4)]
-        muta_players = [p.mutate() for p in random.sample(self.pool, self.pool_size / 2)]
-        self.pool = good_players + comb_players + muta_players
+        self.pool = self.offspring(self.pool, self.pool_size)
+        if self.store is not None:
+            self.store.retain(self.pool)
         self.log.append(self.gene_df)
 
+    @staticmethod
+    def offspring(ranked_pool, pool_size):
+        """
+        Create the next generation from a ranked pool, as a whole population at once: the best quarter
+        is kept, a quarter is created by crossover of random pairs, and half by mutating a random sample.
+
+        Args:
+            ranked_pool (list): List of players, ordered from best to worst.
+            pool_size (int): Size of the new pool.
+
+        Returns:
+            list: List of players.
+        """
+        population = Population.from_genomes(ranked_pool, rng=np.random.RandomState(random.getrandbits(32)))
+        n = len(population)
+        comb_players = population.combine(population.rng.randint(n, size=pool_size / 4),
+                                          population.rng.randint(n, size=pool_size / 4))
+        muta_players = population.mutate(population.rng.choice(n, pool_size / 2, replace=False))
+        return ranked_pool[:pool_size / 4] + comb_players.genomes() + muta_players.genomes()
+
     @property
     def gene_df(self):
         """
@@ -122,6 +194,18 @@ class PlayerPool(object):
         """
         Rank the players in the pool using a RiskRanker.
         """
-        r = RiskRanker(self.pool, n_players=self.n_players, max_turns=self.max_turns)
-        r.run(self.ranking_iterations)
-        self.pool = r.ranked_players()
+        if self.processes != 1 and self.coordinator is None and self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.processes)
+        r = RiskRanker(self.pool, n_players=self.n_players, max_turns=self.max_turns, batched=self.batched,
+                       processes=self.processes, executor=self.executor, coordinator=self.coordinator,
+                       store=self.store)
+        if self.selection == 'racing':
+            self.pool = r.race(self.ranking_iterations, self.pool_size / 4)
+        else:
+            r.run(self.ranking_iterations, tolerance=self.tolerance, k=self.pool_size / 4,
+                  sigma_tolerance=self.sigma_tolerance)
+            self.pool = r.ranked_players()
+        self.n_games += r.n_games
+        df = pd.DataFrame(r.convergence, columns=['iteration', 'games', 'correlation', 'contested', 'cutoff_sigma'])
+        df['generation'] = self.iteration_counter
+        self.convergence_log.append(df)
@@ -1,14 +1,32 @@
+import json
+import os
 import random
+import socket
+import subprocess
+import sys
+import tempfile
 import unittest
 
+import numpy as np
+from trueskill import Rating
+
 import definitions
-from board import Board, Territory
+import distributed
+from arrayboard import ArrayBoard
+from battle import BattleTable, chance_ratios, outcome_distribution, roll_outcomes
+from batch import BatchGame, encode_mission
+from bitboard import BitBoard
+from board import ZOBRIST_ARMIES, Board, Territory, zobrist_key
+from cache import LRUCache
 from cards import Cards
 from game import Game
-from genome import Gene, ListGene, Genome
+from geneticplayer import GeneticPlayer
+from genome import Gene, ListGene, Genome, Population
 from missions import missions
-from player import Player, RandomPlayer
-from ranker import TrueskillRanker, RiskRanker
+from player import AttackPlan, Player, RandomPlayer
+from randomsource import RandomSource
+from ranker import RatingStore, TrueskillRanker, RiskRanker, play_seats, rank_correlation, seat
+from riskga import PlayerPool
 
 
 class TestBoard(unittest.TestCase):
@@ -32,7 +50,7 @@ class TestBoard(unittest.TestCase):
             self.assertLessEqual(def_loss, n_def)
 
     def test_moves(self):
-        random.seed(5)
+        random.seed(400)
         b = Board.create(3)
         self.assertEqual(b.continent_owner(4), 0)
         self.assertEqual(b.continent_owner(5), None)
@@ -47,9 +65,376 @@ class TestBoard(unittest.TestCase):
         b.fortify(4, 37, 10)
         self.assertRaises(ValueError, b.fortify, 37, 2, 14)
 
+    def test_counters(self):
+        random.seed(2)
+        g = Game.create([RandomPlayer() for _ in range(4)])
+        g.initialize_armies()
+        for _ in range(50):
+            g.play_turn()
+        b = g.board
+        for pid in range(4):
+            self.assertEqual(b.n_territories(pid), len([t for t in b.data if t.player_id == pid]))
+            self.assertEqual(b.n_armies(pid), sum(t.armies for t in b.data if t.player_id == pid))
+            self.assertEqual(b.n_mobile(pid), len(list(b.mobile(pid))))
+            for cid in range(6):
+                owned = [t for t in b.continent(cid) if t.player_id == pid]
+                self.assertEqual(b.continent_counts[pid, cid], len(owned))
+
+    def test_move_index(self):
+        for board_cls in (Board, ArrayBoard, BitBoard):
+            random.seed(6)
+            g = Game.create([RandomPlayer() for _ in range(4)], board_cls=board_cls)
+            g.initialize_armies()
+            b = g.board
+            for _ in range(30):
+                g.play_turn()
+                token = b.snapshot()
+                if b.frontier(0):
+                    b.set_owner(b.frontier(0)[0], 1)
+                b.revert(token)
+                b.check_consistency()
+                for pid in range(4):
+                    self.assertEqual(b.possible_attacks(pid), [
+                        (f.territory_id, f.armies, t.territory_id, t.player_id, t.armies)
+                        for f in b.mobile(pid) for t in b.neighbors(f.territory_id) if t.player_id != pid])
+                    self.assertEqual(b.possible_fortifications(pid), [
+                        (f.territory_id, f.armies, t.territory_id, t.player_id, t.armies)
+                        for f in b.mobile(pid) for t in b.neighbors(f.territory_id) if t.player_id == pid])
+                    self.assertEqual(b.frontier(pid), [tid for tid in b.territories_of(pid)
+                                                       if any(b.hostile_neighbors(tid))])
+            if board_cls is ArrayBoard:
+                continue
+            if board_cls is BitBoard:
+                b.mobile_mask ^= 1
+            else:
+                b.hostile_counts[0] += 1
+            self.assertRaises(ValueError, b.check_consistency)
+            self.assertRaises(ValueError, b.check_consistency)
+            if board_cls is BitBoard:
+                b.mobile_mask ^= 1
+            else:
+                b.hostile_counts[0] -= 1
+            b.check_consistency()
+
+    def test_changes(self):
+        b = Board([Territory(tid, tid % 2, 1) for tid in range(42)])
+        self.assertEqual(b.changes_since(b.version), [])
+        b.set_armies(3, 5)
+        b.set_owner(4, 1)
+        self.assertEqual(b.changes_since(0), [(3, False), (4, True)])
+        self.assertEqual(b.changes_since(1), [(4, True)])
+        for _ in range(100):
+            b.add_armies(5, 1)
+        self.assertIsNone(b.changes_since(0))
+
+    def test_journal(self):
+        for board_cls in (Board, ArrayBoard, BitBoard):
+            random.seed(6)
+            b = board_cls.create(3)
+            initial = list(b.data)
+            counts = [(b.n_territories(pid), b.n_armies(pid), b.reinforcements(pid)) for pid in range(3)]
+            outer = b.snapshot()
+            b.set_armies(4, 50)
+            inner = b.apply([(37, b.owner(4), 3)])
+            for t in list(b.hostile_neighbors(4))[:1]:
+                b.attack(4, t.territory_id, 10)
+            b.revert(inner)
+            self.assertEqual(b.armies(4), 50)
+            self.assertEqual(b.data[37], initial[37])
+            inner = b.snapshot()
+            b.add_armies(5, 4)
+            b.commit(inner)
+            self.assertEqual(b.armies(5), initial[5].armies + 4)
+            self.assertRaises(ValueError, b.apply, [(6, 0, 0)])
+            b.revert(outer)
+            self.assertEqual(b.data, initial)
+            self.assertEqual(counts, [(b.n_territories(pid), b.n_armies(pid), b.reinforcements(pid))
+                                      for pid in range(3)])
+            self.assertEqual(b.journal, [])
+            b.commit(b.apply([(4, 2, 7)]))
+            self.assertEqual(b.data[4], Territory(4, 2, 7))
+            self.assertEqual(b.journal, [])
+            if board_cls is BitBoard:
+                self.assertEqual(b.owner_masks[2] >> 4 & 1, 1)
+
+    def test_hash(self):
+        random.seed(7)
+        g = Game.create([RandomPlayer() for _ in range(4)])
+        g.initialize_armies()
+        for _ in range(20):
+            g.play_turn()
+        b = g.board
+        self.assertEqual(b.state_hash, reduce(lambda h, t: h ^ zobrist_key(t), b.data, 0))
+        self.assertEqual(b.state_hash, ArrayBoard(b.data).state_hash)
+        initial = b.state_hash
+        token = b.snapshot()
+        b.add_armies(0, 1)
+        self.assertNotEqual(b.state_hash, initial)
+        b.revert(token)
+        self.assertEqual(b.state_hash, initial)
+        b.add_armies(0, ZOBRIST_ARMIES)
+        self.assertNotEqual(b.state_hash, initial)
+        self.assertEqual(b.state_hash, reduce(lambda h, t: h ^ zobrist_key(t), b.data, 0))
+
     def test_topology(self):
         b = Board.create(5)
         self.assertEqual(len(tuple(b.neighbors(0))), 5)
+        self.assertEqual([t.territory_id for t in b.neighbors(0)], [6, 15, 21, 35, 36])
+        self.assertTrue(b.is_neighbor(0, 35))
+        self.assertFalse(b.is_neighbor(0, 1))
+
+
+class TestArrayBoard(unittest.TestCase):
+
+    def test_queries(self):
+        random.seed(1)
+        for n_players in [2, 3, 4, 5, 6]:
+            data = [Territory(tid, random.randint(0, n_players - 1), random.randint(1, 5)) for tid in range(42)]
+            b, ab = Board(list(data)), ArrayBoard(data)
+            self.assertEqual(b.data, ab.data)
+            for tid in range(42):
+                self.assertEqual(b.n_hostile_neighbors(tid), ab.n_hostile_neighbors(tid))
+            for pid in range(n_players):
+                self.assertEqual(b.n_armies(pid), ab.n_armies(pid))
+                self.assertEqual(b.n_territories(pid), ab.n_territories(pid))
+                self.assertEqual(b.territories_of(pid), ab.territories_of(pid))
+                self.assertEqual(b.n_mobile(pid), ab.n_mobile(pid))
+                self.assertEqual(b.reinforcements(pid), ab.reinforcements(pid))
+                self.assertEqual(b.n_continents(pid), ab.n_continents(pid))
+                self.assertEqual(list(b.mobile(pid)), list(ab.mobile(pid)))
+                self.assertEqual(b.possible_attacks(pid), ab.possible_attacks(pid))
+                self.assertEqual(b.possible_fortifications(pid), ab.possible_fortifications(pid))
+                self.assertEqual(b.frontier(pid), ab.frontier(pid))
+                for cid in range(6):
+                    self.assertEqual(b.continent_fraction(cid, pid), ab.continent_fraction(cid, pid))
+                    self.assertEqual(b.owns_continent(pid, cid), ab.owns_continent(pid, cid))
+                    self.assertEqual(b.num_foreign_continent_territories(cid, pid),
+                                     ab.num_foreign_continent_territories(cid, pid))
+            for cid in range(6):
+                self.assertEqual(b.continent_owner(cid), ab.continent_owner(cid))
+
+    def test_play(self):
+        random.seed(0)
+        for i in [3, 4, 5, 6]:
+            players = [RandomPlayer() for _ in range(i)]
+            g = Game.create(players, board_cls=ArrayBoard)
+            g.initialize_armies()
+            while not g.has_ended():
+                g.play_turn()
+
+
+class TestBattle(unittest.TestCase):
+
+    def test_rolls(self):
+        for a in (1, 2, 3):
+            for d in (1, 2):
+                outcomes = roll_outcomes(a, d)
+                self.assertAlmostEqual(sum(p for _, _, p in outcomes), 1.)
+                for att_loss, def_loss, _ in outcomes:
+                    self.assertEqual(att_loss + def_loss, min(a, d))
+        self.assertTrue(np.allclose(chance_ratios, [[1.41, 0.73, 0.52], [2.89, 1.57, 0.85]], atol=0.05))
+
+    def test_table(self):
+        path = os.path.join(tempfile.mkdtemp(), 'battle.npy')
+        t = BattleTable(20, 20, path=path)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(BattleTable(20, 20, path=path).data.shape, (3, 21, 21))
+        self.assertEqual(t.win_probability(0, 5), 0.)
+        self.assertEqual(t.win_probability(5, 0), 1.)
+        self.assertAlmostEqual(t.win_probability(1, 1), 15. / 36, places=6)
+        self.assertTrue(np.all(np.diff(t.data[0][1:, 1:], axis=0) >= -1e-6))
+        self.assertTrue(np.allclose(t.expected_loss([5, 50], [5, 50]), t.expected_loss([5, 20], [5, 20])))
+        random.seed(9)
+        b = Board.create(2)
+        wins, losses, survivors = 0, 0, 0
+        for _ in range(5000):
+            att, dfd = 5, 4
+            while att > 0 and dfd > 0:
+                att_loss, def_loss = b.fight(att, dfd)
+                att, dfd = att - att_loss, dfd - def_loss
+            wins += dfd == 0
+            losses += 5 - att
+            survivors += att
+        self.assertAlmostEqual(wins / 5000., t.win_probability(5, 4), delta=0.03)
+        self.assertAlmostEqual(losses / 5000., t.expected_loss(5, 4), delta=0.1)
+        self.assertAlmostEqual(survivors / 5000., t.expected_survivors(5, 4), delta=0.1)
+
+    def test_distribution(self):
+        t = BattleTable(20, 20, path=os.path.join(tempfile.mkdtemp(), 'battle.npy'))
+        states, cumulative = outcome_distribution(12, 7)
+        self.assertAlmostEqual(cumulative[-1], 1.)
+        probabilities = np.diff([0.] + cumulative)
+        self.assertAlmostEqual(sum(p for (a, d), p in zip(states, probabilities) if d == 0), t.win_probability(12, 7),
+                               places=5)
+        self.assertAlmostEqual(sum(p * a for (a, d), p in zip(states, probabilities)), t.expected_survivors(12, 7),
+                               places=4)
+        states, _ = outcome_distribution(12, 7, stop=4)
+        self.assertTrue(all(d == 0 or a <= 4 for a, d in states))
+
+    def test_blitz(self):
+        random.seed(10)
+        data = [Territory(tid, 0 if tid == 4 else 1, 1) for tid in range(42)]
+        n = 4000
+        repeated, blitzed = {}, {}
+        for _ in range(n):
+            b = Board(list(data))
+            b.set_armies(4, 7)
+            b.set_armies(37, 4)
+            while b.armies(4) > 3 and b.owner(37) == 1:
+                b.attack(4, 37, b.armies(4) - 1)
+            outcome = (b.armies(4), b.owner(37), b.armies(37))
+            repeated[outcome] = repeated.get(outcome, 0) + 1
+
+            b = Board(list(data))
+            b.set_armies(4, 7)
+            b.set_armies(37, 4)
+            b.blitz(4, 37, stop=2)
+            outcome = (b.armies(4), b.owner(37), b.armies(37))
+            blitzed[outcome] = blitzed.get(outcome, 0) + 1
+        self.assertEqual(set(repeated), set(blitzed))
+        for outcome in repeated:
+            self.assertAlmostEqual(repeated[outcome] / float(n), blitzed[outcome] / float(n), delta=0.03)
+        self.assertRaises(ValueError, Board(list(data)).blitz, 4, 37)
+
+
+class TestBitBoard(unittest.TestCase):
+
+    def test_queries(self):
+        random.seed(3)
+        for n_players in [2, 3, 4, 5, 6]:
+            data = [Territory(tid, random.randint(0, n_players - 1), random.randint(1, 3)) for tid in range(42)]
+            b, bb = Board(list(data)), BitBoard(list(data))
+            for tid in range(42):
+                self.assertEqual(list(b.hostile_neighbors(tid)), list(bb.hostile_neighbors(tid)))
+                self.assertEqual(list(b.friendly_neighbors(tid)), list(bb.friendly_neighbors(tid)))
+                self.assertEqual(b.n_hostile_neighbors(tid), bb.n_hostile_neighbors(tid))
+            for pid in range(n_players):
+                self.assertEqual(b.territories_of(pid), bb.territories_of(pid))
+                self.assertEqual(list(b.mobile(pid)), list(bb.mobile(pid)))
+                self.assertEqual((b.n_territories(pid), b.n_armies(pid), b.n_mobile(pid)),
+                                 (bb.n_territories(pid), bb.n_armies(pid), bb.n_mobile(pid)))
+                self.assertEqual(b.n_continents(pid), bb.n_continents(pid))
+                self.assertEqual(b.frontier(pid), bb.frontier(pid))
+                self.assertEqual(b.possible_attacks(pid), bb.possible_attacks(pid))
+                self.assertEqual(b.possible_fortifications(pid), bb.possible_fortifications(pid))
+                for cid in range(6):
+                    self.assertEqual(b.owns_continent(pid, cid), bb.owns_continent(pid, cid))
+                    self.assertEqual(b.continent_fraction(cid, pid), bb.continent_fraction(cid, pid))
+                    self.assertEqual(b.num_foreign_continent_territories(cid, pid),
+                                     bb.num_foreign_continent_territories(cid, pid))
+
+    def test_play(self):
+        random.seed(0)
+        for i in [3, 4, 5, 6]:
+            players = [RandomPlayer() for _ in range(i)]
+            g = Game.create(players, board_cls=BitBoard)
+            g.initialize_armies()
+            while not g.has_ended():
+                g.play_turn()
+            for pid in g.player_ids:
+                owned = [t.territory_id for t in g.board.data if t.player_id == pid]
+                self.assertEqual(g.board.owner_masks[pid], sum(1 << tid for tid in owned))
+            self.assertEqual(g.board.mobile_mask, sum(1 << t.territory_id for t in g.board.data if t.armies > 1))
+
+
+class TestBatchGame(unittest.TestCase):
+
+    def test_run(self):
+        bg = BatchGame.create(50, 4, seed=0)
+        winners = bg.run(1500)
+        self.assertEqual(winners.shape, (50,))
+        self.assertTrue(np.all((winners >= -1) & (winners < 4)))
+        self.assertTrue(np.all(bg.turns > 0))
+        self.assertEqual(len(bg.game_ids), 0)
+
+    def test_genetic(self):
+        random.seed(0)
+        pools = [[GeneticPlayer.create() for _ in range(3)] + [RandomPlayer()] for _ in range(20)]
+        bg = BatchGame.from_players(pools, seed=1)
+        self.assertTrue(np.all(bg.genetic[:, :3]))
+        self.assertFalse(np.any(bg.genetic[:, 3]))
+        bg.run(200)
+        self.assertRaises(ValueError, BatchGame.from_players, [[Player(), RandomPlayer()]])
+
+    def test_features(self):
+        random.seed(4)
+        players = [GeneticPlayer.create() for _ in range(4)]
+        g = Game.create(players)
+        g.initialize_armies()
+        for _ in range(20):
+            g.play_turn()
+        bg = BatchGame.from_players([players], seed=0)
+        bg.owner[0] = [t.player_id for t in g.board.data]
+        bg.armies[0] = [t.armies for t in g.board.data]
+        for pid, mission in enumerate(g.missions):
+            kind, target, continents, extra = encode_mission(mission)
+            bg.mission_kind[0, pid], bg.mission_target[0, pid] = kind, target
+            bg.mission_continents[0, pid], bg.mission_extra[0, pid] = continents, extra
+        for player in players:
+            features = bg.features(np.array([0]), np.array([player.player_id]))
+            for tid in range(42):
+                expected = (player.direct_bonus(tid), player.continent_value(tid), player.mission_value(tid),
+                            player.army_vantage(tid), player.territory_vantage(tid))
+                self.assertTrue(np.allclose([f[0, tid] for f in features], expected))
+        self.assertEqual(bg.has_won()[0].tolist(), [g.has_won(pid) for pid in range(4)])
+
+
+class TestCache(unittest.TestCase):
+
+    def test_lru(self):
+        c = LRUCache(maxsize=2)
+        c.put('a', 1)
+        c.put('b', 2)
+        self.assertEqual(c.get('a'), 1)
+        c.put('c', 3)
+        self.assertNotIn('b', c)
+        self.assertEqual(c.lookup('d', lambda: 4), 4)
+        self.assertEqual(c.lookup('d', lambda: 5), 4)
+        self.assertEqual(len(c), 2)
+        self.assertEqual(c.get('b', 0), 0)
+
+    def test_player_cache(self):
+        turns = []
+        for cache in (None, LRUCache(1000)):
+            random.seed(8)
+            players = [GeneticPlayer.create() for _ in range(4)]
+            for p in players:
+                p.cache = cache
+            g = Game.create(players)
+            g.initialize_armies()
+            for _ in range(100):
+                g.play_turn()
+                if g.has_ended():
+                    break
+            turns.append((g.turn, g.board.data))
+        self.assertEqual(turns[0], turns[1])
+        player = players[0]
+        attacks = player.attacks
+        token = g.board.snapshot()
+        g.board.add_armies(player.territories[0], 1)
+        g.board.revert(token)
+        hits = cache.hits
+        self.assertEqual(player.attacks, attacks)
+        self.assertGreater(cache.hits, hits)
+        g.board.add_armies(player.territories[0], ZOBRIST_ARMIES)
+        self.assertEqual(player.attacks, g.board.possible_attacks(player.player_id))
+
+    def test_versioned(self):
+        random.seed(3)
+        p = RandomPlayer()
+        g = Game.create([p, RandomPlayer(), RandomPlayer()])
+        g.initialize_armies()
+        version = g.board.version
+        attacks, territories = p.attacks, p.territories
+        self.assertIs(p.attacks, attacks)
+        self.assertIs(p.territories, territories)
+        g.board.add_armies(territories[0], 1)
+        self.assertEqual(g.board.version, version + 1)
+        self.assertIsNot(p.territories, territories)
+        self.assertEqual(p.attacks, g.board.possible_attacks(p.player_id))
+        self.assertEqual(p.fortifications, g.board.possible_fortifications(p.player_id))
+        g.board = Board([Territory(tid, 0, 1) for tid in range(42)])
+        self.assertEqual(p.attacks, [])
 
 
 class TestCards(unittest.TestCase):
@@ -96,6 +481,12 @@ class TestDefinitions(unittest.TestCase):
             for neighbor in neighbors:
                 self.assertIn(i, definitions.territory_neighbors[neighbor])
 
+    def test_neighbor_index(self):
+        for i in range(42):
+            neighbor_ids = definitions.territory_neighbor_ids[i]
+            self.assertEqual(sorted(definitions.territory_neighbors[i]), list(neighbor_ids))
+            self.assertEqual(definitions.territory_neighbor_masks[i], sum(1 << n for n in neighbor_ids))
+
 
 class TestGame(unittest.TestCase):
 
@@ -117,6 +508,131 @@ class TestGame(unittest.TestCase):
             while not g.has_ended():
                 g.play_turn()
 
+    def test_feature_table(self):
+        random.seed(7)
+        players = [GeneticPlayer.create() for _ in range(4)]
+        g = Game.create(players)
+        g.initialize_armies()
+        for _ in range(40):
+            g.play_turn()
+            for player in players:
+                self.assertTrue(np.allclose(player.features, player.feature_table()))
+                if not player.territories:
+                    continue
+                g.board.add_armies(player.territories[0], 1)
+                self.assertTrue(np.allclose(player.features, player.feature_table()))
+
+    def test_scoring(self):
+        random.seed(13)
+        players = [GeneticPlayer.create() for _ in range(4)]
+        g = Game.create(players)
+        g.initialize_armies()
+        for _ in range(30):
+            g.play_turn()
+            p = g.current_player
+            if p.attacks:
+                self.assertTrue(np.allclose(p.attack_weights(p.attacks), [p.attack_weight(a) for a in p.attacks]))
+            if p.fortifications:
+                self.assertTrue(np.allclose(p.fortification_weights(p.fortifications), [sum((
+                    p.army_vantage_difference(f) * p['ft_avantage_wgt'],
+                    p.territory_vantage_difference(f) * p['ft_tvantage_wgt'],
+                    (p.mission_value(f.from_territory_id) - p.mission_value(f.to_territory_id)) * p['ft_mission_wgt'],
+                    (p.direct_bonus(f.from_territory_id) - p.direct_bonus(f.to_territory_id)) * p['ft_bonus_wgt'],
+                    (f.from_armies - 1) * p['ft_narmies_wgt'])) for f in p.fortifications]))
+            weights = p.reinforce_weights(p.territories)
+            self.assertEqual(p.reinforce(), p.territories[list(weights).index(max(weights))])
+
+    def test_reinforce_many(self):
+        random.seed(11)
+        players = [GeneticPlayer.create() for _ in range(4)]
+        g = Game.create(players)
+        g.initialize_armies()
+        for _ in range(40):
+            g.play_turn()
+            for player in players:
+                if g.board.n_territories(player.player_id) == 0:
+                    continue
+                version = g.board.version
+                data = list(g.board.data)
+                allocation = player.reinforce_many(7)
+                self.assertEqual(allocation, Player.reinforce_many(player, 7))
+                self.assertEqual(sum(allocation.values()), 7)
+                self.assertEqual(g.board.data, data)
+                self.assertGreaterEqual(g.board.version, version)
+        b = Board([Territory(tid, tid % 2, 1) for tid in range(42)])
+        b.place_armies({0: 2, 1: 3, 2: 0})
+        self.assertEqual([b.armies(tid) for tid in range(4)], [3, 4, 1, 1])
+        self.assertRaises(ValueError, b.place_armies, {0: -1})
+        self.assertRaises(ValueError, b.place_armies, {0: 1, 1: 1}, 0)
+        self.assertEqual(b.armies(0), 3)
+
+    def test_initialize_armies(self):
+        for mode in ('interleaved', 'batched', 'parallel'):
+            random.seed(12)
+            players = [GeneticPlayer.create() for _ in range(3)] + [RandomPlayer()]
+            g = Game.create(players)
+            g.initialize_armies(mode=mode)
+            self.assertEqual(g.turn, 0)
+            for pid in range(4):
+                self.assertEqual(g.board.n_armies(pid), g.starting_armies)
+            self.assertEqual(g.remaining_armies(), {pid: 0 for pid in range(4)})
+            self.assertFalse(g.initialize_single_army())
+        self.assertRaises(ValueError, Game.create([Player() for _ in range(3)]).initialize_armies, 'wrong')
+
+    def test_seed(self):
+        def play(seed):
+            g = Game.create([RandomPlayer() for _ in range(4)], seed=seed)
+            g.initialize_armies()
+            for _ in range(50):
+                g.play_turn()
+            return g.board.data, [c.cards for c in g.cards], [m.description for m in g.missions]
+        random.seed(0)
+        self.assertEqual(play(1), (random.seed(0), play(1))[1])
+        self.assertNotEqual(play(1)[0], play(2)[0])
+
+    def test_attack_plan(self):
+        random.seed(0)
+        for _ in range(100):
+            g = Game.create([Player() for _ in range(2)])
+            g.board = Board([Territory(i, 0 if i == 0 else 1, 30 if i == 0 else 10) for i in range(42)])
+            conquered = g.execute_plan(AttackPlan(0, 6, max_losses=5))
+            if conquered:
+                self.assertEqual(g.board.owner(6), 0)
+            else:
+                self.assertLessEqual(g.board.armies(0), 25)
+            g.board = Board([Territory(i, 0 if i == 0 else 1, 30 if i == 0 else 10) for i in range(42)])
+            conquered = g.execute_plan(AttackPlan(0, 6, min_ratio=2.))
+            self.assertTrue(conquered or g.board.armies(0) - 1 < 2 * g.board.armies(6))
+            g.board = Board([Territory(i, 0 if i == 0 else 1, 30 if i == 0 else 10) for i in range(42)])
+            self.assertFalse(g.execute_plan(AttackPlan(0, 6, condition=lambda att, dfd: False)))
+            self.assertEqual(g.board.armies(0) + g.board.armies(6), 38)
+
+    def test_play_genetic_plans(self):
+        random.seed(0)
+        for plan_attacks in (True, False):
+            players = [GeneticPlayer.create() for _ in range(4)]
+            for player in players:
+                player.plan_attacks = plan_attacks
+            g = Game.create(players)
+            g.initialize_armies()
+            while not g.has_ended() and g.turn < 1000:
+                g.play_turn()
+        self.assertFalse(GeneticPlayer.plan_attacks)
+
+        # The plan only continues in battle states in which the attack weight stays above the cutoff
+        g = Game.create([GeneticPlayer.create() for _ in range(4)])
+        g.initialize_armies()
+        for player in g.players:
+            for attack in player.attacks:
+                attack = attack._replace(from_armies=attack.from_armies + 10)
+                min_weight = player.attack_weight(attack) - 1.
+                ratio = player.plan_ratio(attack, min_weight)
+                for att in range(1, attack.from_armies):
+                    for dfd in range(1, attack.to_armies + 1):
+                        if att >= ratio * dfd:
+                            state = attack._replace(from_armies=att + 1, to_armies=dfd)
+                            self.assertGreaterEqual(player.attack_weight(state), min_weight - 1e-9)
+
 
 class TestGenome(unittest.TestCase):
 
@@ -146,6 +662,58 @@ class TestGenome(unittest.TestCase):
         g2 = Genome.create()
         g3 = g1.combine(g2)
         _ = g3.mutate()
+        self.assertEqual(g1.gene_names, ['x', 'y', 'z'])
+        self.assertEqual(g1.layout()[1], {'x': 0, 'y': 1, 'z': 2})
+        for name in g1.gene_names:
+            self.assertIn(g3[name], (g1[name], g2[name]))
+        self.assertIsInstance(g1.genes['z'], int)
+        self.assertEqual(Genome(g1.genes), g1)
+        self.assertEqual(hash(Genome(g1.genes)), hash(g1))
+        self.assertEqual(Genome.from_values(g1.values), g1)
+        self.assertTrue(np.array_equal(g1.vector(('z', 'x')), [g1['z'], g1['x']]))
+        self.assertRaises(ValueError, Genome, dict(g1.genes, w=1.))
+
+    def test_population(self):
+        random.seed(14)
+        pool = [GeneticPlayer.create() for _ in range(200)]
+        population = Population.from_genomes(pool)
+        self.assertEqual(population.genomes(), pool)
+        self.assertEqual(population.select([3, 1]).genomes(), [pool[3], pool[1]])
+        children = population.combine(range(100), range(100, 200)).genomes()
+        for child, mother, father in zip(children, pool[:100], pool[100:]):
+            for name in child.gene_names:
+                self.assertIn(child[name], (mother[name], father[name]))
+        mutants = population.mutate()
+        specifications = GeneticPlayer.layout()[0]
+        changed = (mutants.values != population.values).mean(axis=0)
+        for j, spec in enumerate(specifications):
+            column = mutants.values[:, j]
+            if isinstance(spec, ListGene):
+                self.assertTrue(set(column) <= set(spec.values))
+            else:
+                self.assertTrue(np.all((column >= spec.min_value) & (column <= spec.max_value)))
+                self.assertTrue(np.allclose(column, np.round(column, spec.precision)))
+                self.assertLessEqual(changed[j], spec.volatility + 0.05)
+        self.assertGreater(changed.sum(), 0)
+        self.assertTrue(all(isinstance(m, GeneticPlayer) for m in mutants.genomes()))
+        offspring = PlayerPool.offspring(pool, 100)
+        self.assertEqual(len(offspring), 100)
+        self.assertEqual(offspring[:25], pool[:25])
+
+    def test_mutate(self):
+        random.seed(15)
+        gene = Gene(name='x', min_value=-1., max_value=1., volatility=1., granularity=0.5, precision=2)
+        values = [gene.mutate(0.) for _ in range(100)]
+        self.assertGreater(len(set(values)), 10)
+        self.assertTrue(all(-1. <= v <= 1. and v == round(v, 2) for v in values))
+
+    def test_save_load(self):
+        path = os.path.join(tempfile.mkdtemp(), 'genes.json')
+        pool = PlayerPool(GeneticPlayer, pool_size=4)
+        pool.save(path)
+        self.assertEqual(PlayerPool.load(GeneticPlayer, path, pool_size=4).pool, pool.pool)
+        with open(path) as genes_file:
+            self.assertEqual(json.load(genes_file), pool.genes)
 
 
 class TestMission(unittest.TestCase):
@@ -160,6 +728,24 @@ class TestMission(unittest.TestCase):
             self.assertFalse(m.evaluate(b))
 
 
+class TestRandomSource(unittest.TestCase):
+
+    def test_draws(self):
+        rng = RandomSource(seed=0, block_size=10)
+        dices = sum((rng.dice(3) for _ in range(1000)), [])
+        self.assertEqual(len(dices), 3000)
+        self.assertEqual(set(dices), {1, 2, 3, 4, 5, 6})
+        self.assertAlmostEqual(np.mean(dices), 3.5, delta=0.1)
+        ints = [rng.randint(2, 4) for _ in range(1000)]
+        self.assertEqual(set(ints), {2, 3, 4})
+        values = range(10)
+        rng.shuffle(values)
+        self.assertEqual(sorted(values), range(10))
+        self.assertEqual(RandomSource(seed=5).dice(100), RandomSource(seed=5).dice(100))
+        self.assertEqual([RandomSource(seed=5).random() for _ in range(3)],
+                         [RandomSource(seed=5).random() for _ in range(3)])
+
+
 class TestRanker(unittest.TestCase):
 
     def test_tsrank(self):
@@ -179,5 +765,182 @@ class TestRanker(unittest.TestCase):
             rank = rr.rank()
             self.assertEqual(len(rank), 20)
 
+    def test_riskrank_batched(self):
+        rr = RiskRanker([RandomPlayer() for _ in range(20)], n_players=4, batched=True)
+        rr.run(2)
+        self.assertEqual(len(rr.ranked_players()), 20)
+
+    def test_riskrank_processes(self):
+        random.seed(3)
+        genomes = [GeneticPlayer.create() for _ in range(6)]
+        scores = []
+        for processes in (1, 2):
+            players = [GeneticPlayer.from_values(g.values) for g in genomes] + [RandomPlayer() for _ in range(2)]
+            random.seed(5)
+            with RiskRanker(players, n_players=4, max_turns=100, processes=processes) as rr:
+                rr.run(1)
+                executor = rr.executor
+                rr.run(1)
+                self.assertIs(rr.executor, executor)
+            self.assertIsNone(rr.executor)
+            scores.append([rr.score(id(p)) for p in players])
+        self.assertEqual(scores[0], scores[1])
+
+        # The process pool of a PlayerPool is shared by all generations
+        with PlayerPool(GeneticPlayer, pool_size=8, ranking_iterations=1, processes=2) as pool:
+            pool.iteration()
+            executor = pool.executor
+            pool.iteration()
+            self.assertIs(pool.executor, executor)
+        self.assertIsNone(pool.executor)
+
+    def test_rating_store(self):
+        store = RatingStore(sigma_inflation=4.)
+        p = GeneticPlayer.create()
+        self.assertEqual(store.get(p), (None, 0))
+        store.put(p, Rating(mu=30., sigma=3.), 5)
+        rating, games = store.get(GeneticPlayer.from_values(p.values))
+        self.assertEqual((rating.mu, rating.sigma, games), (30., 5., 5))
+        store.retain([RandomPlayer()])
+        self.assertNotIn(p, store)
+
+    def test_riskrank_store(self):
+        random.seed(3)
+        store = RatingStore()
+        players = [GeneticPlayer.create() for _ in range(8)]
+        rr = RiskRanker(players, store=store)
+        rr.run(2)
+        self.assertEqual(len(store), 8)
+        self.assertEqual(rr.n_games, 4)
+
+        # Returning players are warm-started, and only fill up the games of the new player
+        returning = [GeneticPlayer.from_values(p.values) for p in players]
+        rr2 = RiskRanker(returning + [GeneticPlayer.create()], store=store)
+        self.assertEqual([rr2.score(id(p)) for p in returning], [rr.score(id(p)) for p in players])
+        rr2.run(2)
+        self.assertEqual(rr2.n_games, 2)
+        self.assertEqual(len(store), 9)
+
+        # Without a store, every run has all players play every iteration
+        rr3 = RiskRanker(players, max_turns=200)
+        rr3.run(2)
+        rr3.run(2)
+        self.assertEqual(rr3.n_games, 8)
+
+    def test_rank_correlation(self):
+        self.assertEqual(rank_correlation([1, 2, 3, 4], [1, 2, 3, 4]), 1.)
+        self.assertEqual(rank_correlation([1, 2, 3, 4], [4, 3, 2, 1]), -1.)
+        self.assertAlmostEqual(rank_correlation([1, 2, 3, 5], [2, 1, 3, 4]), 0.5)
+        self.assertEqual(rank_correlation([1], [1]), 1.)
+
+    def test_adaptive_pools(self):
+        players = [RandomPlayer() for _ in range(10)]
+        rr = RiskRanker(players, schedule='adaptive')
+        uncertain = id(players[3])
+        for p in players:
+            rr.ratings[id(p)] = Rating(mu=25., sigma=8. if id(p) == uncertain else 2.)
+        pools = rr.adaptive_pools(rr.player_ids, 3)
+        self.assertEqual(len(pools), 2)
+        self.assertEqual(pools[0][0], uncertain)
+        self.assertEqual(len(set(sum(pools, []))), 8)
+        self.assertRaises(ValueError, RiskRanker, players, schedule='unknown')
+
+    def test_riskrank_adaptive(self):
+        rr = RiskRanker([RandomPlayer() for _ in range(10)], n_players=4, schedule='adaptive', rounds=3)
+        rr.run(2)
+        self.assertEqual(rr.n_games, 6)
+        self.assertEqual(len(rr.ranked_players()), 10)
+
+    def test_riskrank_race(self):
+        players = [RandomPlayer() for _ in range(8)]
+        rr = RiskRanker(players)
+        for i, p in enumerate(players):
+            rr.ratings[id(p)] = Rating(mu=40. - 5. * i, sigma=4.)
+        self.assertEqual(rr.contested(rr.player_ids, 2), [id(p) for p in players[1:3]])
+        self.assertEqual(rr.contested(rr.player_ids, 8), [])
+
+        # Players 2 and 3 are contested; the budget of 4 games is spent on them, the others are retired
+        random.seed(4)
+        rr = RiskRanker(players, n_players=2)
+        for i, p in enumerate(players):
+            rr.ratings[id(p)] = Rating(mu=50. if i < 2 else -100. if i > 3 else 25., sigma=8. if i in (2, 3) else 1.)
+        ranked = rr.race(1, 3, warmup=0, confidence=3.)
+        self.assertEqual(ranked[:2], players[:2])
+        self.assertEqual(rr.n_games, 4)
+        self.assertEqual([rr.games[id(p)] for p in players], [0, 0, 4, 4, 0, 0, 0, 0])
+        self.assertRaises(ValueError, PlayerPool, GeneticPlayer, pool_size=4, selection='unknown')
+
+    def test_riskrank_convergence(self):
+        rr = RiskRanker([RandomPlayer() for _ in range(8)], n_players=4)
+        rr.run(3, k=2)
+        self.assertEqual([m['iteration'] for m in rr.convergence], [1, 2, 3])
+        self.assertIsNone(rr.convergence[0]['correlation'])
+        self.assertTrue(-1. <= rr.convergence[1]['correlation'] <= 1.)
+        self.assertGreaterEqual(rr.convergence[2]['cutoff_sigma'], 0.)
+
+        # Any correlation meets a tolerance of 2, so the run stops once there is a previous ranking
+        rr = RiskRanker([RandomPlayer() for _ in range(8)], n_players=4)
+        rr.run(5, tolerance=2.)
+        self.assertEqual(len(rr.convergence), 2)
+        self.assertEqual(rr.n_games, 4)
+        self.assertRaises(ValueError, rr.run, 1, sigma_tolerance=1.)
+
+
+class TestDistributed(unittest.TestCase):
+
+    @staticmethod
+    def start_workers(coordinator, n):
+        host, port = coordinator.address
+        cwd = os.path.dirname(os.path.abspath(distributed.__file__))
+        return [subprocess.Popen([sys.executable, '-m', 'distributed', host, str(port), '--batch-size', '2'], cwd=cwd)
+                for _ in range(n)]
+
+    def test_seats(self):
+        p = GeneticPlayer.create()
+        player_cls, values = distributed.decode_seat(json.loads(json.dumps(distributed.encode_seat(seat(p)))))
+        self.assertIs(player_cls, GeneticPlayer)
+        self.assertEqual(player_cls.from_values(values), p)
+        self.assertEqual(distributed.decode_seat(distributed.encode_seat(seat(RandomPlayer()))), (RandomPlayer, None))
+
+    def test_lost_jobs(self):
+        seats = [[seat(GeneticPlayer.create()) for _ in range(3)] for _ in range(5)]
+        seeds = range(5)
+        expected = [play_seats(s, 60, seed) for s, seed in zip(seats, seeds)]
+        with distributed.Coordinator(poll=0.1) as coordinator:
+            winners = coordinator.map(seats, 60, seeds)
+            lost = socket.create_connection(coordinator.address)
+            lost.sendall(json.dumps({'n': 2}) + '\n')
+            self.assertEqual([job['id'] for job in json.loads(lost.makefile().readline())['jobs']], [0, 1])
+            lost.close()
+            workers = self.start_workers(coordinator, 1)
+            self.assertEqual(list(winners), expected)
+        for worker in workers:
+            self.assertEqual(worker.wait(), 0)
+
+    def test_failed_jobs(self):
+        seats = [[seat(RandomPlayer()), (Gene, None)], [seat(RandomPlayer()), seat(RandomPlayer())]]
+        with distributed.Coordinator(poll=0.1, max_attempts=2) as coordinator:
+            workers = self.start_workers(coordinator, 1)
+            self.assertRaises(distributed.JobError, list, coordinator.map(seats, 60, [0, 1]))
+            self.assertEqual(list(coordinator.map(seats[1:], 60, [1])), [play_seats(seats[1], 60, 1)])
+        for worker in workers:
+            self.assertEqual(worker.wait(), 0)
+
+    def test_riskrank_distributed(self):
+        random.seed(3)
+        genomes = [GeneticPlayer.create() for _ in range(6)]
+        scores = []
+        with distributed.Coordinator(poll=0.1) as coordinator:
+            workers = self.start_workers(coordinator, 2)
+            for c in (None, coordinator):
+                players = [GeneticPlayer.from_values(g.values) for g in genomes] + [RandomPlayer() for _ in range(2)]
+                random.seed(5)
+                rr = RiskRanker(players, n_players=4, max_turns=100, coordinator=c)
+                rr.run(2)
+                scores.append([rr.score(id(p)) for p in players])
+        for worker in workers:
+            self.assertEqual(worker.wait(), 0)
+        self.assertEqual(scores[0], scores[1])
+
 if __name__ == '__main__':
     unittest.main()